@@ -1,9 +1,12 @@
 from enum import Enum
+from itertools import accumulate
+
 import mesa
 
-from .base import BaseSeaAgent
+from .base import BaseSeaAgent, Countdown, StoredField
 from .food_source import Plankton
-import numpy as np
+from events import DeathCause, EventType
+from profiling import profiled
 
 Position = tuple[int, int]
 
@@ -11,8 +14,28 @@ Position = tuple[int, int]
 class Animal(BaseSeaAgent):
     """
     Base class for all animals in the simulation.
+
+    The state of the animal is kept in a row of its species' columns in the
+    model's AgentStore, the animal is only a handle to its row. When the
+    store is vectorized, the per-step bookkeeping described by the class
+    attributes below is done for all animals of a species at once.
     """
 
+    __slots__ = ()
+
+    energy = StoredField()
+    max_energy = StoredField()
+    time_to_grow = Countdown()
+
+    # energy used every step
+    ENERGY_USE_PER_STEP = 0
+    # whether time to grow counts down every step
+    GROWS = False
+    # whether running out of energy is checked before the animal does anything
+    STARVES_BEFORE_ACTING = False
+    # cause of a death, unless told otherwise
+    DEATH_CAUSE = DeathCause.STARVATION
+
     def __init__(
             self,
             unique_id: int,
@@ -22,6 +45,8 @@ class Animal(BaseSeaAgent):
             energy: int = None,
     ) -> None:
         super().__init__(unique_id, position, model, moore)
+        self.store = model.agent_store.get(type(self))
+        self.row = self.store.allocate(self)
         self.energy = energy
 
     def _find_empty_cell_in_neighborhood(self, radius: int = 1) -> Position:
@@ -29,24 +54,30 @@ class Animal(BaseSeaAgent):
         Find an empty cell in the neighborhood and return its coordinates.
         Returns None if there is no empty cell in the neighborhood
         """
-        neighborhood = list(
-            self.model.grid.get_neighborhood(
-                self.position, self.moore, include_center=True, radius=radius
-            )
+        neighborhood = self.model.grid.get_neighborhood(
+            self.position, self.moore, include_center=True, radius=radius
         )
 
-        self.random.shuffle(neighborhood)
-        for next_position in neighborhood:
-            cell_agents = self.model.grid.get_cell_list_contents([next_position])
-            if self.model.grid.is_cell_empty(next_position) or all(
-                    [agent.is_food_source() for agent in cell_agents]
-            ):
-                return next_position
-        return None
+        empty_cells = [
+            position
+            for position in neighborhood
+            if self.model.grid.is_free_of_non_food(position)
+        ]
+        return self.model.random_buffer.choice(empty_cells) if empty_cells else None
+
+    def die(self, cause: DeathCause = DEATH_CAUSE) -> None:
+        self.model.events.record(EventType.DEATH, self, cause=cause)
+        self.remove()
 
-    def die(self) -> None:
+    def remove(self) -> None:
+        """
+        Removes the animal from the grid, the schedule and the store.
+        """
         self.model.grid.remove_agent(self)
         self.model.schedule.remove(self)
+        if self.row is not None:
+            self.store.release(self.row)
+            self.row = None
 
 
 class MovingAnimal(Animal):
@@ -57,6 +88,8 @@ class MovingAnimal(Animal):
     other agents.
     """
 
+    __slots__ = ()
+
     def __init__(
             self,
             unique_id: int,
@@ -67,6 +100,7 @@ class MovingAnimal(Animal):
     ) -> None:
         super().__init__(unique_id, position, model, moore, energy)
 
+    @profiled
     def random_move(self, radius: int = 1, look_for=None) -> None:
         """
         Step one cell in any allowable direction.
@@ -81,20 +115,16 @@ class MovingAnimal(Animal):
         )
 
         if look_for:
-            contains_agent = lambda position: any(
-                isinstance(agent, look_for)
-                for agent in self.model.grid.get_cell_list_contents([position])
+            best_moves = self.model.grid.cells_containing(
+                self.position, radius, look_for, self.moore
             )
-            best_moves = [
-                position for position in possible_moves if contains_agent(position)
-            ]
         else:
             best_moves = possible_moves
 
         next_position = (
-            self.random.choice(best_moves)
+            self.model.random_buffer.choice(best_moves)
             if best_moves
-            else self.random.choice(possible_moves)
+            else self.model.random_buffer.choice(possible_moves)
         )
 
         self.position = next_position
@@ -114,6 +144,8 @@ class JellyfishMedusa(MovingAnimal):
     - a parameter that determines the number of offspring
     """
 
+    __slots__ = ("sex",)
+
     class Sex(Enum):
         MALE = 0
         FEMALE = 1
@@ -121,18 +153,26 @@ class JellyfishMedusa(MovingAnimal):
         def is_opposite(self, other):
             return self != other
 
+    ENERGY_USE_PER_STEP = 1
+    GROWS = True
+
     def __init__(self, unique_id, position, model, moore=True, max_energy=12):
         super().__init__(unique_id, position, model, moore, energy=max_energy)
         self.max_energy = max_energy
         self.time_to_grow = self.model.jellyfish_medusa_time_to_grow
 
-        self.sex = self.Sex.MALE if self.random.random() < 0.5 else self.Sex.FEMALE
+        self.sex = (
+            self.Sex.MALE
+            if self.model.random_buffer.random() < 0.5
+            else self.Sex.FEMALE
+        )
 
     def step(self):
         self.random_move(radius=3, look_for=Plankton)
 
-        self.energy -= 1
-        self.time_to_grow -= 1
+        if not self.store.VECTORIZED:
+            self.energy -= 1
+            self._count_down()
 
         if self.energy < self.max_energy:
             self._eat()
@@ -146,36 +186,53 @@ class JellyfishMedusa(MovingAnimal):
 
             if (
                     partners
-                    and self.random.random()
+                    and self.model.random_buffer.random()
                     < self.model.jellyfish_medusa_reproduce_probability
             ):
                 self._reproduce()
 
+    @profiled
     def _eat(self):
         def _eat_plankton():
-            neighbors = self.model.grid.get_neighbors(
-                self.position, self.moore, include_center=True
+            layer = self.model.plankton_layer
+            if layer is not None:
+                available_food = self.model.grid.cells_containing(
+                    self.position, 1, Plankton, self.moore, include_center=True
+                )
+                if available_food:
+                    density = layer.eat(
+                        self.model.random_buffer.choice(available_food)
+                    )
+                    self.model.events.record(
+                        EventType.PREDATION, self, other_species="Plankton"
+                    )
+                    self.energy += self.model.jellyfish_medusa_gain_from_food * density
+                return
+
+            available_food = self.model.grid.get_neighbors_of_type(
+                self.position, 1, Plankton, moore=self.moore, include_center=True
             )
-            available_food = [
-                agent for agent in neighbors if isinstance(agent, Plankton)
-            ]
             if available_food:
-                plankton: Plankton = self.random.choice(available_food)
+                plankton: Plankton = self.model.random_buffer.choice(available_food)
                 energy_gain = self.model.jellyfish_medusa_gain_from_food * plankton.density
+                self.model.events.record(EventType.PREDATION, self, plankton)
                 plankton.die()
                 self.energy += energy_gain
 
         def _eat_fish():
-            neighbors = self.model.grid.get_neighbors(
-                self.position, self.moore, include_center=True
+            available_food = self.model.grid.get_neighbors_of_type(
+                self.position,
+                1,
+                Fish,
+                lambda fish: not fish.is_mature(),
+                moore=self.moore,
+                include_center=True,
             )
-            available_food = [
-                agent for agent in neighbors if isinstance(agent, Fish) and not agent.is_mature()
-            ]
             if available_food:
-                fish: Fish = self.random.choice(available_food)
+                fish: Fish = self.model.random_buffer.choice(available_food)
                 energy_gain = self.model.jellyfish_medusa_gain_from_food
-                fish.die()
+                self.model.events.record(EventType.PREDATION, self, fish)
+                fish.die(DeathCause.PREDATION)
                 self.energy += energy_gain
 
         _eat_plankton()
@@ -184,28 +241,22 @@ class JellyfishMedusa(MovingAnimal):
     def is_mature(self):
         return self.time_to_grow < 0
 
+    @profiled
     def _find_partners(self):
-        neighbors = self.model.grid.get_neighbors(
-            self.position, self.moore, include_center=True
+        partners = self.model.grid.get_neighbors_of_type(
+            self.position,
+            1,
+            self.__class__,
+            lambda partner: partner is not self
+            and partner.is_mature()
+            and self.sex.is_opposite(partner.sex),
+            moore=self.moore,
+            include_center=True,
         )
-        potential_partners = [
-            agent
-            for agent in neighbors
-            if isinstance(agent, self.__class__) and agent is not self
-        ]
-        partners = [
-            partner
-            for partner in potential_partners
-            if partner.is_mature() and self.sex.is_opposite(partner.sex)
-        ]
-
-        if partners:
-            print(
-                f"{self.__class__.__name__} ({self.sex.name}) found {len(partners)} partners"
-            )
 
         return partners
 
+    @profiled
     def _reproduce(self):
         """
         Creates new jellyfish larvas
@@ -215,21 +266,8 @@ class JellyfishMedusa(MovingAnimal):
         """
 
         ### Jesli wiecej niz 4 zajete pola w sasiedztwie - nie rozmnaża się
-        neighborhood = list(
-            self.model.grid.get_neighborhood(
-                self.position, self.moore, include_center=False, radius=1
-            )
-        )
-        num_agents = len(
-            [
-                1
-                for position in neighborhood
-                if [
-                agent
-                for agent in self.model.grid.get_cell_list_contents([position])
-                if not isinstance(agent, Plankton)
-            ]
-            ]
+        num_agents = self.model.grid.count_occupied_cells(
+            self.position, self.moore, include_center=False, non_food_only=True
         )
         if num_agents > self.model.jellyfish_empty_cells_to_reproduce:
             return
@@ -237,13 +275,16 @@ class JellyfishMedusa(MovingAnimal):
         if self._find_empty_cell_in_neighborhood(1):
             self.energy /= 2
             self.time_to_grow = 20
-            new_larvas = np.random.normal(
+            self.model.schedule.update_agent(self)
+            self.model.events.record(EventType.MATING, self)
+            new_larvas = self.model.random_buffer.normal(
                 self.model.jellyfish_medusa_reproduce_rate, 0.8
             )
-            for _ in range(int(new_larvas)):
-                child = JellyfishLarva(self.model.next_id(), self.position, self.model)
-                self.model.grid.place_agent(child, child.position)
-                self.model.schedule.add(child)
+            children = self.model.spawn_many(
+                JellyfishLarva, [self.position] * int(new_larvas)
+            )
+            for child in children:
+                self.model.events.record(EventType.BIRTH, child, self)
 
 
 class JellyfishPolyp(Animal):
@@ -253,16 +294,28 @@ class JellyfishPolyp(Animal):
     It can reproduce asexually via strobilation. It doesn't move. It isn't eaten by anything.
     """
 
+    __slots__ = ()
+
+    GROWS = True
+    STARVES_BEFORE_ACTING = True
+    # strobilates into a cell with only food in it
+    WAITS_FOR_NON_FOOD = True
+
+    # with timers, a polyp sleeps until it's grown up, when it starts strobilating
+    time_to_grow = Countdown("wake", fire_at=-1)
+
     def __init__(self, unique_id, position, model, moore=True, energy=30):
         super().__init__(unique_id, position, model, moore, energy)
+        self.asleep = self.model.timers is not None
         self.time_to_grow = self.model.jellyfish_polyp_time_to_grow
 
     def step(self):
-        self.time_to_grow -= 1
+        if not self.store.VECTORIZED:
+            self._count_down()
 
-        if self.energy < 0:
-            self.die()
-            return
+            if self.energy < 0:
+                self.die()
+                return
 
         if self.time_to_grow < 0:
             self._strobilate()
@@ -273,7 +326,11 @@ class JellyfishPolyp(Animal):
             medusa = JellyfishMedusa(self.model.next_id(), new_position, self.model)
             self.model.grid.place_agent(medusa, medusa.position)
             self.model.schedule.add(medusa)
+            self.model.events.record(EventType.STROBILATION, self, medusa)
+            self.model.events.record(EventType.BIRTH, medusa, self)
             self.energy -= 1
+        else:
+            self._wait_for_space()
 
 
 class JellyfishLarva(MovingAnimal):
@@ -283,6 +340,12 @@ class JellyfishLarva(MovingAnimal):
     Moves, eats plankton and transforms into a polyp after growing up enough.
     """
 
+    __slots__ = ()
+
+    GROWS = True
+
+    time_to_grow = Countdown("_transform", fire_at=-1)
+
     def __init__(self, unique_id, position, model, moore=True, energy=60):
         super().__init__(unique_id, position, model, moore, energy)
         self.time_to_grow = self.model.jellyfish_larva_time_to_grow
@@ -290,7 +353,8 @@ class JellyfishLarva(MovingAnimal):
     def step(self):
         self.random_move()
 
-        self.time_to_grow -= 1
+        if not self.store.VECTORIZED:
+            self._count_down()
         if self.time_to_grow < 0:
             self._transform()
             return
@@ -299,9 +363,10 @@ class JellyfishLarva(MovingAnimal):
         polyp = JellyfishPolyp(self.model.next_id(), self.position, self.model)
         self.model.grid.place_agent(polyp, self.position)
         self.model.schedule.add(polyp)
+        self.model.events.record(EventType.METAMORPHOSIS, self, polyp)
+        self.model.events.record(EventType.BIRTH, polyp, self)
 
-        self.model.grid.remove_agent(self)
-        self.model.schedule.remove(self)
+        self.die(DeathCause.METAMORPHOSIS)
 
 
 class SeaTurtle(MovingAnimal):
@@ -311,25 +376,29 @@ class SeaTurtle(MovingAnimal):
     Eats jellyfish in their medusa phase. Lives so long that it doesn't die in the model. Its reproduction is not a part of the model.
     """
 
+    __slots__ = ()
+
+    # what it hunts and how far it sees it
+    PREY = JellyfishMedusa
+    SIGHT = 5
+
     def __init__(self, unique_id, position, model, moore=True, energy=1000):
         super().__init__(unique_id, position, model, moore, energy=energy)
 
     def step(self):
-        self.random_move(radius=5, look_for=JellyfishMedusa)
+        self.random_move(radius=self.SIGHT, look_for=self.PREY)
 
         self._eat()
 
+    @profiled
     def _eat(self):
-        neighbors = self.model.grid.get_neighbors(
-            self.position, self.moore, include_center=True, radius=5
+        preys = self.model.grid.get_neighbors_of_type(
+            self.position, self.SIGHT, self.PREY, moore=self.moore, include_center=True
         )
-        preys = [agent for agent in neighbors if isinstance(agent, JellyfishMedusa)]
         for prey in preys:
             self.energy += prey.energy
-            prey.die()
-
-        if preys:
-            print(f"Turtle ate {len(preys)} jellyfish medusae.")
+            self.model.events.record(EventType.PREDATION, self, prey)
+        self.model.kill_many(preys, DeathCause.PREDATION)
 
 
 class Fish(MovingAnimal):
@@ -339,6 +408,8 @@ class Fish(MovingAnimal):
     Eats plankton and jellyfish larvae. Reproduces sexually when mature. Dies when it runs out of energy.
     """
 
+    __slots__ = ("sex",)
+
     class Sex(Enum):
         MALE = 0
         FEMALE = 1
@@ -346,21 +417,39 @@ class Fish(MovingAnimal):
         def is_opposite(self, other):
             return self != other
 
+    OFFSPRING_NUMBERS = (1, 2, 3, 4, 5)
+    OFFSPRING_CUM_WEIGHTS = tuple(accumulate((0.4, 0.3, 0.2, 0.075, 0.025)))
+
+    ENERGY_USE_PER_STEP = 1
+    GROWS = True
+    STARVES_BEFORE_ACTING = True
+
+    # what it hunts and how far it sees it
+    PREY = JellyfishLarva
+    SIGHT = 4
+
+    time_to_grow = Countdown("_grow_up", fire_at=-1)
+
     def __init__(self, unique_id, position, model, moore=True, max_energy=100):
         super().__init__(unique_id, position, model, moore, energy=max_energy)
         self.max_energy = max_energy
         self.time_to_grow = self.model.fish_time_to_grow
-        self.sex = self.Sex.MALE if self.random.random() < 0.5 else self.Sex.FEMALE
+        self.sex = (
+            self.Sex.MALE
+            if self.model.random_buffer.random() < 0.5
+            else self.Sex.FEMALE
+        )
 
     def step(self):
-        self.random_move(radius=4, look_for=JellyfishLarva)
+        self.random_move(radius=self.SIGHT, look_for=self.PREY)
 
-        self.energy -= 1
-        self.time_to_grow -= 1
+        if not self.store.VECTORIZED:
+            self.energy -= 1
+            self._count_down()
 
-        if self.energy < 0:
-            self.die()
-            return
+            if self.energy < 0:
+                self.die()
+                return
 
         if self.energy < self.max_energy:
             self._eat()
@@ -370,63 +459,77 @@ class Fish(MovingAnimal):
 
             if (
                     partners
-                    and self.random.random() < self.model.fish_reproduce_probability
+                    and self.model.random_buffer.random() < self.model.fish_reproduce_probability
             ):
                 self._reproduce()
 
     def is_mature(self):
         return self.time_to_grow < 0
 
-    def _eat(self):
-        neighbors = self.model.grid.get_neighbors(
-            self.position, self.moore, include_center=True
-        )
+    def _grow_up(self):
+        self.model.schedule.update_agent(self)
 
+    @profiled
+    def _eat(self):
         if self.is_mature():
-            potential_preys = [
-                agent for agent in neighbors if isinstance(agent, JellyfishLarva)
-            ]
+            potential_preys = self.model.grid.get_neighbors_of_type(
+                self.position, 1, JellyfishLarva, moore=self.moore, include_center=True
+            )
             if potential_preys:
-                prey: JellyfishLarva = self.random.choice(potential_preys)
-                prey.die()
+                prey: JellyfishLarva = self.model.random_buffer.choice(potential_preys)
+                self.model.events.record(EventType.PREDATION, self, prey)
+                prey.die(DeathCause.PREDATION)
                 self.energy += self.model.fish_gain_from_food
                 return
 
-        potential_food = [agent for agent in neighbors if isinstance(agent, Plankton)]
+        layer = self.model.plankton_layer
+        if layer is not None:
+            potential_food = self.model.grid.cells_containing(
+                self.position, 1, Plankton, self.moore, include_center=True
+            )
+            if potential_food:
+                layer.eat(self.model.random_buffer.choice(potential_food))
+                self.model.events.record(
+                    EventType.PREDATION, self, other_species="Plankton"
+                )
+                self.energy += self.model.fish_gain_from_food
+            return
+
+        potential_food = self.model.grid.get_neighbors_of_type(
+            self.position, 1, Plankton, moore=self.moore, include_center=True
+        )
         if potential_food:
-            plankton: Plankton = self.random.choice(potential_food)
+            plankton: Plankton = self.model.random_buffer.choice(potential_food)
             energy_gain = self.model.fish_gain_from_food
+            self.model.events.record(EventType.PREDATION, self, plankton)
             plankton.die()
             self.energy += energy_gain
             return
 
+    @profiled
     def _find_partners(self):
-        neighbors = self.model.grid.get_neighbors(
-            self.position, self.moore, include_center=True
+        partners = self.model.grid.get_neighbors_of_type(
+            self.position,
+            1,
+            self.__class__,
+            lambda partner: partner is not self
+            and partner.is_mature()
+            and self.sex.is_opposite(partner.sex),
+            moore=self.moore,
+            include_center=True,
         )
-        potential_partners = [
-            agent
-            for agent in neighbors
-            if isinstance(agent, self.__class__) and agent is not self
-        ]
-        partners = [partner for partner in potential_partners if
-                    partner.is_mature() and self.sex.is_opposite(partner.sex)]
-
-        if partners:
-            print(
-                f"{self.__class__.__name__} ({self.sex.name}) found {len(partners)} partners"
-            )
 
         return partners
 
+    @profiled
     def _reproduce(self):
         self.energy /= 2
-        fish_num = self.random.choices(
-            [1, 2, 3, 4, 5], weights=[0.4, 0.3, 0.2, 0.075, 0.025], k=1
+        self.model.events.record(EventType.MATING, self)
+        fish_num = self.model.random_buffer.weighted_choice(
+            self.OFFSPRING_NUMBERS, self.OFFSPRING_CUM_WEIGHTS
         )
-        for _ in range(fish_num[0]):
-            child = Fish(
-                self.model.next_id(), self.position, self.model, self.moore, self.energy
-            )
-            self.model.grid.place_agent(child, self.position)
-            self.model.schedule.add(child)
+        children = self.model.spawn_many(
+            Fish, [self.position] * fish_num, moore=self.moore, max_energy=self.energy
+        )
+        for child in children:
+            self.model.events.record(EventType.BIRTH, child, self)
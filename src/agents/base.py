@@ -1,3 +1,5 @@
+from typing import Optional
+
 import mesa
 
 
@@ -6,17 +8,170 @@ import mesa
 Position = tuple[int, int]
 
 
-class BaseSeaAgent(mesa.Agent):
+class StoredField:
+    """
+    An attribute of an agent kept in a column of its species' store, when the
+    agent has one, or in the agent's slot of the same name with a leading
+    underscore otherwise.
+    """
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+        self.slot = f"_{name}"
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        if agent.row is None:
+            return getattr(agent, self.slot)
+        return agent.store.columns[self.name][agent.row]
+
+    def __set__(self, agent, value) -> None:
+        if agent.row is None:
+            setattr(agent, self.slot, value)
+        else:
+            agent.store.columns[self.name][agent.row] = value
+
+
+class Countdown(StoredField):
+    """
+    A StoredField with the number of steps left until something happens
+    to the agent, e.g. until it grows up.
+
+    Without the model's TimerWheel, the agent decrements it every step. With
+    one, the step at which it reaches 0 is stored instead, so it counts down
+    without being touched, and the agent's method named `callback` is called
+    by the wheel at the start of the step in which it falls to `fire_at`.
+    """
+
+    def __init__(self, callback: Optional[str] = None, fire_at: int = 0) -> None:
+        self.callback = callback
+        self.fire_at = fire_at
+
+    def __set_name__(self, owner, name: str) -> None:
+        super().__set_name__(owner, name)
+        # the step the timer is set to, 0 when there is none
+        self.timer_key = f"{name}_timer"
+        self.timer_slot = f"_{self.timer_key}"
+
+    def __get__(self, agent, owner=None):
+        value = super().__get__(agent, owner)
+        if agent is None or agent.model.timers is None:
+            return value
+        return value - agent.model.current_step
+
+    def __set__(self, agent, value) -> None:
+        timers = agent.model.timers
+        if timers is None:
+            super().__set__(agent, value)
+            return
+
+        super().__set__(agent, agent.model.current_step + value)
+        if self.callback is None:
+            return
+        # at the earliest the next step, when the count is already past `fire_at`
+        step = max(
+            agent.model.current_step + value - self.fire_at,
+            agent.model.current_step + 1,
+        )
+        if self.get_timer(agent) != step:
+            self.set_timer(agent, step)
+            timers.start(step, agent, self)
+
+    def get_timer(self, agent) -> int:
+        """
+        Returns the step the agent's timer of this countdown is set to, or 0.
+        """
+        if agent.row is None:
+            return getattr(agent, self.timer_slot, 0)
+        return agent.store.columns[self.timer_key][agent.row]
+
+    def set_timer(self, agent, step: int) -> None:
+        if agent.row is None:
+            setattr(agent, self.timer_slot, step)
+        else:
+            agent.store.columns[self.timer_key][agent.row] = step
+
+    def is_due(self, agent, step: int) -> bool:
+        """
+        Whether the agent's timer of this countdown is set to the step.
+        """
+        return self.get_timer(agent) == step
+
+
+class BaseSeaAgent:
     """
     Base class for all agents in the simulation.
+
+    It has the interface of `mesa.Agent`, but not its `__dict__`: attributes
+    of agents are `__slots__`, declared by every subclass, so an agent takes
+    only a pointer per attribute.
     """
 
+    __slots__ = ("unique_id", "model", "pos", "position", "moore", "store", "row", "asleep")
+
+    # whether the agent waits for space in a cell next to it to be free of
+    # agents that aren't food, instead of empty, see `_wait_for_space`
+    WAITS_FOR_NON_FOOD = False
+
     def __init__(
         self, unique_id: int, position: Position, model: mesa.Model, moore: bool = True
     ) -> None:
-        super().__init__(unique_id, model)
+        self.unique_id = unique_id
+        self.model = model
+        self.pos: Optional[Position] = None
         self.position = position
         self.moore = moore
+        # a SpeciesRows and a row in it, when the state is kept in the model's AgentStore
+        self.store = None
+        self.row = None
+        # skipped by the scheduler until woken, see `wake`
+        self.asleep = False
+
+    @property
+    def sprite(self) -> int:
+        """
+        Which of the two sprites of the species draws the agent, fixed for its life.
+        """
+        return self.unique_id % 2
+
+    @property
+    def random(self):
+        return self.model.random
+
+    def step(self) -> None:
+        pass
+
+    def advance(self) -> None:
+        pass
 
     def is_food_source(self):
         return False
+
+    def wake(self) -> None:
+        """
+        Makes the scheduler step the agent again.
+        """
+        if self.model.dormancy:
+            self.model.grid.stop_waiting(self)
+        self.model.schedule.wake(self)
+
+    def _wait_for_space(self) -> None:
+        """
+        With the model's `dormancy`, makes the scheduler skip the agent until
+        one of the cells next to it is vacated.
+        """
+        if self.model.dormancy:
+            self.model.schedule.sleep(self)
+            self.model.grid.wake_when_vacated(self)
+
+    def _count_down(self) -> None:
+        """
+        Decrements time to grow, unless the model's TimerWheel keeps track of it.
+        Filters of the scheduler are evaluated again only when the agent has
+        just grown up, like AgentStore and the timers do.
+        """
+        if self.model.timers is None:
+            self.time_to_grow -= 1
+            if self.time_to_grow == -1:
+                self.model.schedule.update_agent(self)
@@ -1,6 +1,8 @@
 import mesa
 
-from .base import BaseSeaAgent
+from .base import BaseSeaAgent, Countdown
+from events import DeathCause, EventType
+from profiling import profiled
 
 
 class FoodSource(BaseSeaAgent):
@@ -8,6 +10,8 @@ class FoodSource(BaseSeaAgent):
     Base class for all food sources in the simulation.
     """
 
+    __slots__ = ()
+
     def __init__(self, unique_id, position, model, moore=True) -> None:
         super().__init__(unique_id, position, model, moore)
 
@@ -20,9 +24,17 @@ class Plankton(FoodSource):
     An agent representing a plankton. Main food source for jellyfish and fish.
     """
 
+    __slots__ = ("density", "grow_probability", "_time_to_grow", "_time_to_grow_timer")
+
+    # with timers, a plankton sleeps until it's grown, when it starts spreading
+    time_to_grow = Countdown("wake")
+    # cause of a death, unless told otherwise
+    DEATH_CAUSE = DeathCause.PREDATION
+
     def __init__(self, unique_id, position, model, density=0.5, moore=True):
         super().__init__(unique_id, position, model, moore)
         self.density = density
+        self.asleep = self.model.timers is not None
         self.time_to_grow = self.model.plankton_time_to_grow
         self.grow_probability = self.model.plankton_grow_probability
 
@@ -30,35 +42,42 @@ class Plankton(FoodSource):
         """
         Plankton density grows at each step, when it reaches 1, new plankton agent appears at random neighbour grid cell
         """
-        self.time_to_grow -= 1
+        self._count_down()
         if self.time_to_grow <= 0:
             self.grow()
 
+    @profiled
     def grow(self):
         """
         Creates new plankton agent
         """
 
         ### Jesli wiecej niz 4 zajete pola w sasiedztwie - nie rozmnaża się
-        neighborhood = list(self.model.grid.get_neighborhood(
-            self.position, self.moore, include_center=False, radius=1
-        ))
-        num_agents = len([1 for position in neighborhood if self.model.grid.get_cell_list_contents([position])])
+        num_agents = self.model.grid.count_occupied_cells(
+            self.position, self.moore, include_center=False
+        )
         if num_agents > self.model.plankton_empty_cells_to_reproduce:
+            self._wait_for_space()
             return
 
-        new_position = self.random.choice(
-            self.model.grid.get_neighborhood(self.position, self.moore, False)
-        )
+        neighborhood = self.model.grid.get_neighborhood(self.position, self.moore, False)
+        if self.model.dormancy and num_agents == len(neighborhood):
+            # no cell to grow into until a neighbour leaves
+            self._wait_for_space()
+            return
 
-        grow = (self.model.temperature - self.model.min_allowed_temperature)
-        grow = grow / (self.model.max_allowed_temperature - self.model.min_allowed_temperature)
+        new_position = self.model.random_buffer.choice(neighborhood)
 
-        if self.model.grid.is_cell_empty(new_position) and grow > self.random.random():
+        if (
+            self.model.grid.is_cell_empty(new_position)
+            and self.model.plankton_growth > self.model.random_buffer.random()
+        ):
             plankton = Plankton(self.model.next_id(), new_position, self.model)
             self.model.grid.place_agent(plankton, new_position)
             self.model.schedule.add(plankton)
+            self.model.events.record(EventType.BIRTH, plankton, self)
 
-    def die(self):
+    def die(self, cause: DeathCause = DEATH_CAUSE):
+        self.model.events.record(EventType.DEATH, self, cause=cause)
         self.model.grid.remove_agent(self)
         self.model.schedule.remove(self)
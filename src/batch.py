@@ -0,0 +1,263 @@
+"""
+Headless batch runs of the MarineEcosystem model.
+
+Runs many models for a fixed number of steps across a process pool (one model
+per worker) and writes the collected population counts out as CSV files.
+With `--stream`, every worker streams its data to the file while running,
+so long runs use constant memory. With `--checkpoint-every`, runs save
+checkpoints periodically and the same command run again continues every run
+from its last checkpoint. With `--events`, every run writes its births, deaths
+and other events to a file. With `--stop-when-extinct`, `--stop-plankton-cover`
+or `--stop-steady`, runs stop early, and the step and reason of every run's
+stop are written with its parameters.
+
+Example (from the `src` directory):
+    python batch.py --steps 730 --seeds 0 1 2 --min-used-temperature 5 10 --workers 8 --output-dir results
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+
+from config import load_config
+from model import MarineEcosystem
+
+
+CONFIGS_DIR = "configs"
+CONFIG_FILE = "config.json"
+CONFIG_FILE_PATH = f"{CONFIGS_DIR}/{CONFIG_FILE}"
+
+# model keyword argument -> key in the "initial_population" section of the config
+INITIAL_POPULATION_PARAMETERS = {
+    "initial_population_jellyfish_medusa": "JellyfishMedusa",
+    "initial_population_jellyfish_polyp": "JellyfishPolyp",
+    "initial_population_jellyfish_larva": "JellyfishLarva",
+    "initial_population_fish": "Fish",
+    "initial_population_plankton": "Plankton",
+    "initial_population_sea_turtle": "SeaTurtle",
+}
+
+TEMPERATURE_PARAMETERS = ("min_used_temperature", "max_used_temperature")
+
+SWEEP_PARAMETERS = (*INITIAL_POPULATION_PARAMETERS, *TEMPERATURE_PARAMETERS)
+
+
+def default_parameters(config_filepath: str = CONFIG_FILE_PATH) -> dict:
+    """
+    Returns the model keyword arguments that the sliders of the server start with.
+    """
+    config = load_config(config_filepath)
+
+    parameters = {
+        parameter: config.initial_population[agent]
+        for parameter, agent in INITIAL_POPULATION_PARAMETERS.items()
+    }
+    for parameter in TEMPERATURE_PARAMETERS:
+        parameters[parameter] = getattr(config, parameter)
+    parameters["config_filepath"] = config_filepath
+    return parameters
+
+
+def build_sweep(base_parameters: dict, grid: dict[str, list]) -> list[dict]:
+    """
+    Returns keyword arguments of every run in the cartesian product of the grid values.
+    """
+    names = list(grid)
+    return [
+        {**base_parameters, **dict(zip(names, values))}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def collector_path(output_dir: str, index: int, parameters: dict) -> str:
+    """
+    Returns where the run streams its data, named after the format of its collector.
+    """
+    file_format = load_config(parameters["config_filepath"]).collector_format
+    return os.path.join(output_dir, f"run_{index:04d}.{file_format}")
+
+
+def run_single(
+    parameters: dict,
+    steps: int,
+    checkpoint_path: str = None,
+    checkpoint_every: int = None,
+) -> tuple[Optional[pd.DataFrame], dict]:
+    """
+    Runs one model for a given number of steps and returns its collected data,
+    or None if the data was streamed to a file, and the step and reason of
+    its stop (None when it ran all the steps).
+
+    If a checkpoint exists at the path, the run continues from it. When
+    `checkpoint_every` is given, a checkpoint is saved every that many steps.
+    """
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        model = MarineEcosystem.from_checkpoint(checkpoint_path)
+    else:
+        model = MarineEcosystem(**parameters)
+
+    try:
+        while model.running and model.current_step < steps:
+            model.step()
+            if checkpoint_every and model.current_step % checkpoint_every == 0:
+                model.save_checkpoint(checkpoint_path)
+    finally:
+        # what was collected before a failed step is written out too
+        model.events.close()
+        if parameters.get("collector_path") is not None:
+            model.datacollector.close()
+    stop = {"stop_step": model.current_step, "stop_reason": model.stop_reason}
+
+    if parameters.get("collector_path") is not None:
+        return None, stop
+
+    frame = model.datacollector.get_model_vars_dataframe()
+    frame.index = pd.RangeIndex(1, len(frame) + 1, name="Step")
+    return frame, stop
+
+
+def run_sweep(
+    runs: list[dict],
+    steps: int,
+    output_dir: str = None,
+    max_workers: int = None,
+    stream: bool = False,
+    collector_interval: int = 1,
+    checkpoint_every: int = None,
+    events: bool = False,
+) -> list[Optional[pd.DataFrame]]:
+    """
+    Runs every parameter set of the sweep in a separate worker process.
+
+    When an output directory is given, data of each run is written to
+    `run_<index>.csv` and parameters of all runs, with the step and reason
+    of their stops, to `runs.csv`.
+    When streaming, runs write their data themselves, every
+    `collector_interval` steps, to these files or, with the "parquet" format
+    of the collector, to `run_<index>.parquet` directories, and None is
+    returned for them.
+    Checkpoints are saved to `checkpoints/run_<index>.npz` and events
+    to `run_<index>.events` in the output directory.
+    """
+    if events:
+        if output_dir is None:
+            raise ValueError("Events require an output directory")
+        os.makedirs(output_dir, exist_ok=True)
+        runs = [
+            {
+                **parameters,
+                "events_path": os.path.join(output_dir, f"run_{index:04d}.events"),
+            }
+            for index, parameters in enumerate(runs)
+        ]
+
+    if stream:
+        if output_dir is None:
+            raise ValueError("Streaming requires an output directory")
+        os.makedirs(output_dir, exist_ok=True)
+        runs = [
+            {
+                **parameters,
+                "collector_path": collector_path(output_dir, index, parameters),
+                "collector_interval": collector_interval,
+            }
+            for index, parameters in enumerate(runs)
+        ]
+
+    checkpoint_paths = itertools.repeat(None)
+    if checkpoint_every:
+        if output_dir is None:
+            raise ValueError("Checkpoints require an output directory")
+        os.makedirs(os.path.join(output_dir, "checkpoints"), exist_ok=True)
+        checkpoint_paths = [
+            os.path.join(output_dir, "checkpoints", f"run_{index:04d}.npz")
+            for index in range(len(runs))
+        ]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                run_single,
+                runs,
+                itertools.repeat(steps),
+                checkpoint_paths,
+                itertools.repeat(checkpoint_every),
+            )
+        )
+    frames = [frame for frame, _ in results]
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        for index, frame in enumerate(frames):
+            if frame is not None:
+                frame.to_csv(os.path.join(output_dir, f"run_{index:04d}.csv"))
+        pd.DataFrame(
+            [{**parameters, **stop} for parameters, (_, stop) in zip(runs, results)]
+        ).rename_axis("Run").to_csv(
+            os.path.join(output_dir, "runs.csv")
+        )
+
+    return frames
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--config", default=CONFIG_FILE_PATH)
+    parser.add_argument("--steps", type=int, default=365)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[None])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output-dir", default="results")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--collector-interval", type=int, default=1)
+    parser.add_argument("--checkpoint-every", type=int, default=None)
+    parser.add_argument("--events", action="store_true")
+    # a group is a comma-separated list of columns, e.g. "Fish,Mature Fish"
+    parser.add_argument("--stop-when-extinct", nargs="+", metavar="GROUP")
+    parser.add_argument("--stop-plankton-cover", type=float)
+    parser.add_argument("--stop-steady", nargs="+", metavar="COLUMN")
+    parser.add_argument("--stop-tolerance", type=float)
+    for parameter in SWEEP_PARAMETERS:
+        parser.add_argument(
+            f"--{parameter.replace('_', '-')}", type=int, nargs="+", dest=parameter
+        )
+    return parser.parse_args(args)
+
+
+def main(args=None) -> None:
+    args = parse_args(args)
+
+    grid = {"seed": args.seeds}
+    for parameter in SWEEP_PARAMETERS:
+        values = getattr(args, parameter)
+        if values is not None:
+            grid[parameter] = values
+
+    parameters = default_parameters(args.config)
+    if args.stop_when_extinct is not None:
+        parameters["stop_extinct"] = [group.split(",") for group in args.stop_when_extinct]
+    if args.stop_plankton_cover is not None:
+        parameters["stop_max_plankton_cover"] = args.stop_plankton_cover
+    if args.stop_steady is not None:
+        parameters["stop_steady_columns"] = args.stop_steady
+    if args.stop_tolerance is not None:
+        parameters["stop_tolerance"] = args.stop_tolerance
+
+    runs = build_sweep(parameters, grid)
+    run_sweep(
+        runs,
+        args.steps,
+        args.output_dir,
+        args.workers,
+        stream=args.stream,
+        collector_interval=args.collector_interval,
+        checkpoint_every=args.checkpoint_every,
+        events=args.events,
+    )
+    print(f"Finished {len(runs)} runs of {args.steps} steps in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares neighborhood queries of Mesa's MultiGrid and MarineGrid.
+
+Example (from the `src` directory):
+    python -m benchmarks.neighborhood --size 1000 --radius 5 --queries 200000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import mesa
+
+from space import MarineGrid, neighborhood_offsets, shared_neighborhoods
+
+
+def new_grid(grid_class, size: int):
+    """
+    Returns an empty grid whose neighborhoods aren't cached yet.
+
+    MarineGrids of one shape share their cache within the process, so it
+    is emptied, otherwise every grid would start warmed by the previous one.
+    """
+    if issubclass(grid_class, MarineGrid):
+        shared_neighborhoods.cache_clear()
+        neighborhood_offsets.cache_clear()
+    return grid_class(size, size, torus=False)
+
+
+def run_queries(grid, positions, radius: int) -> float:
+    """
+    Returns the time of all the queries.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    for position in positions:
+        grid.get_neighborhood(position, True, include_center=False, radius=radius)
+    return time.perf_counter() - start
+
+
+def measure_memory(grid, positions, radius: int) -> int:
+    """
+    Returns memory kept by the grid after all the queries.
+    """
+    tracemalloc.start()
+    run_queries(grid, positions, radius)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memory
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--radius", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(args)
+
+    rng = random.Random(args.seed)
+    positions = [
+        (rng.randrange(args.size), rng.randrange(args.size))
+        for _ in range(args.queries)
+    ]
+    # agents mostly move locally, so the same cells are often asked for again
+    repeated = [positions[rng.randrange(1000)] for _ in range(args.queries)]
+
+    print(
+        f"{args.queries} queries, radius {args.radius}, "
+        f"{args.size}x{args.size} grid"
+    )
+    print(f"{'grid':<12}{'positions':<12}{'time [s]':>10}{'queries/s':>14}{'memory [MB]':>14}")
+    for grid_class in (mesa.space.MultiGrid, MarineGrid):
+        for name, queries in (("random", positions), ("repeated", repeated)):
+            elapsed = run_queries(new_grid(grid_class, args.size), queries, args.radius)
+            memory = measure_memory(new_grid(grid_class, args.size), queries, args.radius)
+            print(
+                f"{grid_class.__name__:<12}{name:<12}{elapsed:>10.3f}"
+                f"{len(queries) / elapsed:>14.0f}{memory / 2**20:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
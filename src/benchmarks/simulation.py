@@ -0,0 +1,348 @@
+"""
+Benchmarks steps of the whole MarineEcosystem at several scales.
+
+Every scale runs in a fresh process with a variant of the config, so peak
+memory of one doesn't hide in another. Results are written as JSON, tagged
+with the commit, and can be compared with results of another commit.
+
+Example (from the `src` directory):
+    python -m benchmarks.simulation --scales small medium --steps 100 --output before.json
+    python -m benchmarks.simulation --scales small medium --steps 100 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional
+
+import mesa
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from model import MarineEcosystem
+
+CONFIG_FILE_PATH = "configs/config.json"
+
+# name -> grid size and initial populations, animals scaled with the area of the grid
+SCALES = {
+    "small": {
+        "width": 120,
+        "height": 80,
+        "initial_population_jellyfish_medusa": 30,
+        "initial_population_jellyfish_polyp": 2,
+        "initial_population_jellyfish_larva": 5,
+        "initial_population_sea_turtle": 2,
+        "initial_population_fish": 20,
+        "initial_population_plankton": 300,
+    },
+    "medium": {
+        "width": 500,
+        "height": 500,
+        "initial_population_jellyfish_medusa": 750,
+        "initial_population_jellyfish_polyp": 50,
+        "initial_population_jellyfish_larva": 125,
+        "initial_population_sea_turtle": 50,
+        "initial_population_fish": 500,
+        "initial_population_plankton": 10_000,
+    },
+    "large": {
+        "width": 1000,
+        "height": 1000,
+        "initial_population_jellyfish_medusa": 3_000,
+        "initial_population_jellyfish_polyp": 200,
+        "initial_population_jellyfish_larva": 500,
+        "initial_population_sea_turtle": 200,
+        "initial_population_fish": 2_000,
+        "initial_population_plankton": 100_000,
+    },
+    "huge": {
+        "width": 2000,
+        "height": 2000,
+        "initial_population_jellyfish_medusa": 12_000,
+        "initial_population_jellyfish_polyp": 800,
+        "initial_population_jellyfish_larva": 2_000,
+        "initial_population_sea_turtle": 800,
+        "initial_population_fish": 8_000,
+        "initial_population_plankton": 1_000_000,
+    },
+}
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def write_config_variant(
+    directory: str,
+    width: int,
+    height: int,
+    plankton_engine: str,
+    agent_store: bool,
+    growth_timers: bool = False,
+    dormancy: bool = False,
+    sparse_grid: bool = False,
+    spatial_hash: bool = False,
+) -> str:
+    """
+    Writes a copy of the config with the grid size and engine options changed.
+    """
+    with open(CONFIG_FILE_PATH) as file:
+        config = json.load(file)
+
+    config["width"] = width
+    config["height"] = height
+    config["agent_store"] = agent_store
+    config["growth_timers"] = growth_timers
+    config["dormancy"] = dormancy
+    config["sparse_grid"] = sparse_grid
+    config["spatial_hash"] = spatial_hash
+    config["plankton"]["engine"] = plankton_engine
+    config.setdefault("profiling", {})["enabled"] = False
+
+    path = os.path.join(directory, f"config_{width}x{height}.json")
+    with open(path, "w") as file:
+        json.dump(config, file, indent=2)
+    return path
+
+
+def count_agents(model: MarineEcosystem) -> int:
+    count = model.schedule.get_agent_count()
+    if model.plankton_layer is not None:
+        count += model.plankton_layer.count()
+    return count
+
+
+def peak_rss() -> Optional[float]:
+    """
+    Returns the peak resident memory of the process in MB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_scale(
+    name: str,
+    steps: int,
+    warmup: int,
+    seed: int,
+    plankton_engine: str,
+    agent_store: bool,
+    time_limit: Optional[float],
+    growth_timers: bool = False,
+    dormancy: bool = False,
+    sparse_grid: bool = False,
+    spatial_hash: bool = False,
+) -> dict:
+    """
+    Builds the model of the scale and measures its steps.
+    """
+    scale = dict(SCALES[name])
+    width, height = scale.pop("width"), scale.pop("height")
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_filepath = write_config_variant(
+            directory,
+            width,
+            height,
+            plankton_engine,
+            agent_store,
+            growth_timers,
+            dormancy,
+            sparse_grid,
+            spatial_hash,
+        )
+        start = time.perf_counter()
+        model = MarineEcosystem(config_filepath, seed=seed, **scale)
+        setup_time = time.perf_counter() - start
+
+    initial_agents = count_agents(model)
+    latencies = []
+    agent_steps = 0
+    for _ in range(warmup):
+        model.step()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        if not model.running:
+            break
+        agents = count_agents(model)
+        step_start = time.perf_counter()
+        model.step()
+        latencies.append(time.perf_counter() - step_start)
+        agent_steps += agents
+        if time_limit is not None and time.perf_counter() - start > time_limit:
+            break
+
+    elapsed = sum(latencies)
+    latencies_ms = 1e3 * np.array(latencies)
+    return {
+        "scale": name,
+        "width": width,
+        "height": height,
+        "initial_populations": scale,
+        "initial_agents": initial_agents,
+        "final_agents": count_agents(model),
+        "setup_time_s": setup_time,
+        "warmup_steps": warmup,
+        "steps": len(latencies),
+        "total_time_s": elapsed,
+        "steps_per_second": len(latencies) / elapsed if elapsed else None,
+        "agents_per_second": agent_steps / elapsed if elapsed else None,
+        "latency_ms": {
+            **{
+                f"p{percentile}": float(np.percentile(latencies_ms, percentile))
+                for percentile in LATENCY_PERCENTILES
+            },
+            "mean": float(latencies_ms.mean()),
+            "max": float(latencies_ms.max()),
+        }
+        if latencies
+        else None,
+        "peak_rss_mb": peak_rss(),
+    }
+
+
+def git_commit() -> dict:
+    """
+    Returns the commit of the working tree and whether it has uncommitted changes.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def environment() -> dict:
+    return {
+        **git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "mesa": mesa.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_results(results: list[dict]) -> None:
+    print(
+        f"{'scale':<8}{'agents':>10}{'steps':>7}{'steps/s':>10}{'agents/s':>12}"
+        f"{'p50 [ms]':>10}{'p90 [ms]':>10}{'p99 [ms]':>10}{'RSS [MB]':>10}"
+    )
+    for result in results:
+        latency = result["latency_ms"] or {}
+        print(
+            f"{result['scale']:<8}{result['initial_agents']:>10}{result['steps']:>7}"
+            f"{result['steps_per_second'] or 0:>10.2f}"
+            f"{result['agents_per_second'] or 0:>12.0f}"
+            f"{latency.get('p50', 0):>10.2f}{latency.get('p90', 0):>10.2f}"
+            f"{latency.get('p99', 0):>10.2f}{result['peak_rss_mb'] or 0:>10.1f}"
+        )
+
+
+def print_comparison(results: list[dict], baseline: dict) -> None:
+    """
+    Prints ratios of the results to results of the same scales in the baseline,
+    above 1 is faster (or smaller) than the baseline.
+    """
+    baseline_results = {result["scale"]: result for result in baseline["results"]}
+    print(f"\nCompared to {baseline.get('commit') or 'baseline'}:")
+    print(f"{'scale':<8}{'steps/s':>10}{'p50':>10}{'p99':>10}{'RSS':>10}")
+    for result in results:
+        old = baseline_results.get(result["scale"])
+        if old is None or not old["latency_ms"] or not result["latency_ms"]:
+            continue
+        print(
+            f"{result['scale']:<8}"
+            f"{result['steps_per_second'] / old['steps_per_second']:>9.2f}x"
+            f"{old['latency_ms']['p50'] / result['latency_ms']['p50']:>9.2f}x"
+            f"{old['latency_ms']['p99'] / result['latency_ms']['p99']:>9.2f}x"
+            + (
+                f"{old['peak_rss_mb'] / result['peak_rss_mb']:>9.2f}x"
+                if old["peak_rss_mb"] and result["peak_rss_mb"]
+                else f"{'-':>10}"
+            )
+        )
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scales", nargs="+", choices=SCALES, default=["small", "medium"])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plankton-engine", choices=("agents", "array"), default="agents")
+    parser.add_argument("--agent-store", action="store_true")
+    parser.add_argument("--growth-timers", action="store_true")
+    parser.add_argument("--dormancy", action="store_true")
+    parser.add_argument("--sparse-grid", action="store_true")
+    parser.add_argument("--spatial-hash", action="store_true")
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=None,
+        help="stop measuring a scale after this many seconds",
+    )
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="JSON results to compare with")
+    args = parser.parse_args(args)
+
+    options = {
+        "steps": args.steps,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "plankton_engine": args.plankton_engine,
+        "agent_store": args.agent_store,
+        "growth_timers": args.growth_timers,
+        "dormancy": args.dormancy,
+        "sparse_grid": args.sparse_grid,
+        "spatial_hash": args.spatial_hash,
+        "time_limit": args.time_limit,
+    }
+    results = []
+    for name in args.scales:
+        # a fresh process for every scale, so its peak memory is its own
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_scale, name, **options).result())
+
+    report = {**environment(), "options": options, "results": results}
+    print_results(results)
+
+    output = args.output or f"benchmark-{(report['commit'] or 'unknown')[:12]}.json"
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("options") != options:
+            print(f"\nWarning: {args.compare} was run with other options: {baseline.get('options')}")
+        print_comparison(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Checkpoints of a running MarineEcosystem.
+
+A checkpoint is a single compressed `.npz` file of plain arrays, without any
+pickled objects:
+- "meta" - JSON with the model's config, parameters, counters and RNG states,
+- "<AgentClass>/<field>" - one array per state field of agents of every class,
+- "<AgentClass>/awake" - ids of the agents the scheduler steps, in its order,
+- "timers/<field>" - pending timers, when growth timers are used,
+- "grid/dormant" - ids of agents waiting for space next to them,
+- "plankton_layer/<field>" - arrays of the plankton layer, when it's used,
+- "datacollector/<column>" - data collected in memory so far,
+- "events/<field>" - counts of events and events kept in memory,
+- "stopping/history" - counts the steady state is checked on, when it's used.
+
+Agents are saved in the order of the schedule, together with their index
+in the list of their grid cell, so a restored model continues exactly like
+the saved one would.
+"""
+import dataclasses
+import json
+import os
+from typing import Type
+
+import mesa
+import numpy as np
+
+from agents.animals import (
+    Fish,
+    JellyfishLarva,
+    JellyfishMedusa,
+    JellyfishPolyp,
+    SeaTurtle,
+)
+from agents.food_source import Plankton
+from config import ModelConfig
+
+AGENT_CLASSES: dict[str, Type[mesa.Agent]] = {
+    agent_class.__name__: agent_class
+    for agent_class in (
+        JellyfishMedusa,
+        JellyfishPolyp,
+        JellyfishLarva,
+        SeaTurtle,
+        Fish,
+        Plankton,
+    )
+}
+
+# state fields of agents, saved when an agent class has them
+AGENT_FIELDS = {
+    "energy": np.float64,
+    "max_energy": np.float64,
+    "time_to_grow": np.int64,
+    "density": np.float64,
+    "sex": np.int8,
+}
+
+
+def save_checkpoint(model: mesa.Model, path: str) -> None:
+    """
+    Writes the state of the model to the path, replacing the file atomically.
+    """
+    arrays = {}
+
+    for agent_class, agents in model.schedule.agents_by_type.items():
+        agents = list(agents.values())
+        prefix = agent_class.__name__
+        arrays[f"{prefix}/unique_id"] = np.array(
+            [agent.unique_id for agent in agents], dtype=np.int64
+        )
+        arrays[f"{prefix}/position"] = np.array(
+            [agent.pos for agent in agents], dtype=np.int64
+        ).reshape(-1, 2)
+        arrays[f"{prefix}/cell_index"] = np.array(
+            [
+                model.grid.get_cell_list_contents([agent.pos]).index(agent)
+                for agent in agents
+            ],
+            dtype=np.int64,
+        )
+        for field, dtype in AGENT_FIELDS.items():
+            if agents and hasattr(agents[0], field):
+                values = [getattr(agent, field) for agent in agents]
+                if field == "sex":
+                    values = [sex.value for sex in values]
+                arrays[f"{prefix}/{field}"] = np.array(values, dtype=dtype)
+        arrays[f"{prefix}/awake"] = np.array(
+            list(model.schedule.awake_by_type[agent_class]), dtype=np.int64
+        )
+
+    if model.timers is not None:
+        for name, values in model.timers.get_state().items():
+            arrays[f"timers/{name}"] = values
+
+    arrays["grid/dormant"] = np.array(
+        [agent.unique_id for agent in model.grid.get_dormant()], dtype=np.int64
+    )
+
+    if model.plankton_layer is not None:
+        arrays["plankton_layer/density"] = model.plankton_layer.density
+        arrays["plankton_layer/time_to_grow"] = model.plankton_layer.time_to_grow
+
+    model_vars = getattr(model.datacollector, "model_vars", None)
+    if model_vars is not None:
+        for column, values in model_vars.items():
+            arrays[f"datacollector/{column}"] = np.array(values)
+    else:
+        model.datacollector.flush()
+
+    model.events.flush()
+    for name, values in model.events.get_state().items():
+        arrays[f"events/{name}"] = values
+
+    if model.stopping.steady_columns:
+        arrays["stopping/history"] = model.stopping.get_state()
+
+    random_version, random_state, gauss_next = model.random.getstate()
+    meta = {
+        "config_filepath": model.config_filepath,
+        # the config itself, which may not be the file's, e.g. after `dataclasses.replace`
+        "config": dataclasses.asdict(model.config),
+        "parameters": model.parameters,
+        "agent_classes": [
+            agent_class.__name__ for agent_class in model.schedule.agents_by_type
+        ],
+        "current_step": model.current_step,
+        "current_id": model.current_id,
+        "temperature": model.temperature,
+        "running": model.running,
+        "stop_reason": model.stop_reason,
+        "schedule_steps": model.schedule.steps,
+        "schedule_time": model.schedule.time,
+        "random_version": random_version,
+        "gauss_next": gauss_next,
+        "rng_state": model.rng.bit_generator.state,
+    }
+    arrays["meta"] = np.array(json.dumps(meta))
+    arrays["random_state"] = np.array(random_state, dtype=np.uint64)
+    arrays["random_buffer/uniforms"] = np.array(model.random_buffer._uniforms)
+    arrays["random_buffer/normals"] = np.array(model.random_buffer._normals)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(model_class: Type[mesa.Model], path: str, **overrides) -> mesa.Model:
+    """
+    Creates a model from the checkpoint.
+
+    Overrides replace parameters the model was created with, e.g. to branch
+    a what-if run off the saved state. Giving a new "seed" starts fresh random
+    streams instead of continuing the saved ones.
+    """
+    with np.load(path, allow_pickle=False) as checkpoint:
+        arrays = dict(checkpoint)
+    meta = json.loads(str(arrays["meta"]))
+
+    parameters = {**meta["parameters"], **overrides}
+    for name in parameters:
+        if name.startswith("initial_population_"):
+            parameters[name] = 0
+    # data streamed before the checkpoint is kept
+    parameters["collector_append"] = True
+    parameters["events_append"] = True
+    # checkpoints saved before the config was in them have only its file
+    config = (
+        ModelConfig.from_fields(meta["config"]) if "config" in meta else meta["config_filepath"]
+    )
+    model = model_class(config, **parameters)
+    # time to grow counted by timers is relative to the current step
+    model.current_step = meta["current_step"]
+
+    agents = []
+    for class_name in meta["agent_classes"]:
+        agent_class = AGENT_CLASSES[class_name]
+        for index, unique_id in enumerate(arrays[f"{class_name}/unique_id"].tolist()):
+            position = tuple(arrays[f"{class_name}/position"][index].tolist())
+            agent = agent_class(unique_id, position, model)
+            for field in AGENT_FIELDS:
+                values = arrays.get(f"{class_name}/{field}")
+                if values is not None:
+                    value = values[index].item()
+                    setattr(agent, field, agent.Sex(value) if field == "sex" else value)
+            cell_index = arrays[f"{class_name}/cell_index"][index].item()
+            agents.append(((*position, cell_index), agent))
+
+    in_cell_order = [agent for _, agent in sorted(agents, key=lambda item: item[0])]
+    model.grid.place_agents(in_cell_order, [agent.position for agent in in_cell_order])
+    # the order of types, also of ones without agents, decides the order of activation
+    for class_name in meta["agent_classes"]:
+        model.schedule.agents_by_type[AGENT_CLASSES[class_name]]
+    model.schedule.add_many([agent for _, agent in agents])
+    for class_name in meta["agent_classes"]:
+        awake = arrays.get(f"{class_name}/awake")
+        if awake is not None:
+            model.schedule.set_awake(AGENT_CLASSES[class_name], awake.tolist())
+    agents_by_id = {agent.unique_id: agent for _, agent in agents}
+    if model.timers is not None and "timers/step" in arrays:
+        model.timers.set_state(
+            {name: arrays[f"timers/{name}"] for name in ("step", "agent", "countdown")},
+            agents_by_id,
+        )
+    for unique_id in arrays.get("grid/dormant", np.zeros(0, dtype=np.int64)).tolist():
+        model.grid.wake_when_vacated(agents_by_id[unique_id])
+
+    if model.plankton_layer is not None:
+        model.plankton_layer.density[:] = arrays["plankton_layer/density"]
+        model.plankton_layer.time_to_grow[:] = arrays["plankton_layer/time_to_grow"]
+
+    if hasattr(model.datacollector, "model_vars"):
+        for column in model.datacollector.model_vars:
+            values = arrays.get(f"datacollector/{column}")
+            if values is not None:
+                model.datacollector.model_vars[column] = values.tolist()
+    else:
+        model.datacollector.truncate(meta["current_step"])
+
+    model.events.set_state(
+        {
+            name: arrays[f"events/{name}"]
+            for name in ("count_keys", "count_values", "seen", "buffer")
+        }
+    )
+    model.events.truncate(meta["current_step"])
+
+    model.current_id = meta["current_id"]
+    if meta["temperature"] is not None:
+        model.update_temperature()
+    if model.stopping.steady_columns and "stopping/history" in arrays:
+        model.stopping.set_state(arrays["stopping/history"])
+    model.running = meta["running"]
+    model.stop_reason = meta.get("stop_reason")
+    model.schedule.steps = meta["schedule_steps"]
+    model.schedule.time = meta["schedule_time"]
+
+    if "seed" not in overrides:
+        model.random.setstate(
+            (
+                meta["random_version"],
+                tuple(arrays["random_state"].tolist()),
+                meta["gauss_next"],
+            )
+        )
+        model.rng.bit_generator.state = meta["rng_state"]
+        model.random_buffer._uniforms = arrays["random_buffer/uniforms"].tolist()
+        model.random_buffer._normals = arrays["random_buffer/normals"].tolist()
+
+    return model
+
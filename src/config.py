@@ -0,0 +1,208 @@
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+PLANKTON_ENGINES = ("agents", "array")
+
+# parameters of species, attributes of the model of the same names: (section, key)
+SPECIES_PARAMETERS = {
+    "jellyfish_larva_time_to_grow": ("jellyfish_larva", "time_to_grow"),
+    "jellyfish_polyp_time_to_grow": ("jellyfish_polyp", "time_to_grow"),
+    "jellyfish_polyp_gain_from_food": ("jellyfish_polyp", "gain_from_food"),
+    "jellyfish_medusa_time_to_grow": ("jellyfish_medusa", "time_to_grow"),
+    "jellyfish_medusa_reproduce_probability": ("jellyfish_medusa", "reproduce_probability"),
+    "jellyfish_medusa_reproduce_rate": ("jellyfish_medusa", "reproduce_rate"),
+    "jellyfish_medusa_gain_from_food": ("jellyfish_medusa", "gain_from_food"),
+    "jellyfish_empty_cells_to_reproduce": (
+        "jellyfish_medusa",
+        "max_non_empty_neighbour_cells_to_reproduce",
+    ),
+    "plankton_time_to_grow": ("plankton", "time_to_grow"),
+    "plankton_grow_probability": ("plankton", "grow_probability"),
+    "plankton_empty_cells_to_reproduce": (
+        "plankton",
+        "max_non_empty_neighbour_cells_to_reproduce",
+    ),
+    "fish_time_to_grow": ("fish", "time_to_grow"),
+    "fish_gain_from_food": ("fish", "gain_from_food"),
+    "fish_reproduce_probability": ("fish", "reproduction_probability"),
+}
+
+PROBABILITIES = (
+    "jellyfish_medusa_reproduce_probability",
+    "plankton_grow_probability",
+    "fish_reproduce_probability",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelConfig:
+    """
+    The config file of a MarineEcosystem, parsed and checked once.
+
+    Models take it instead of the path of the file, so many models of one
+    process share it, and workers get it with their arguments instead of
+    reading the file again. It can't be modified, a changed copy is made
+    with `dataclasses.replace`.
+
+    Example:
+    >>> config = load_config("configs/config.json")
+    >>> model = MarineEcosystem(config, **parameters)
+    >>> strip = dataclasses.replace(config, height=40)
+    """
+
+    width: int
+    height: int
+    max_allowed_temperature: float
+    min_allowed_temperature: float
+    max_used_temperature: float
+    min_used_temperature: float
+    initial_population: dict[str, int]
+
+    jellyfish_larva_time_to_grow: int
+    jellyfish_polyp_time_to_grow: int
+    jellyfish_polyp_gain_from_food: int
+    jellyfish_medusa_time_to_grow: int
+    jellyfish_medusa_reproduce_probability: float
+    jellyfish_medusa_reproduce_rate: int
+    jellyfish_medusa_gain_from_food: int
+    jellyfish_empty_cells_to_reproduce: int
+    plankton_time_to_grow: int
+    plankton_grow_probability: float
+    plankton_empty_cells_to_reproduce: int
+    fish_time_to_grow: int
+    fish_gain_from_food: int
+    fish_reproduce_probability: float
+
+    plankton_engine: str = "agents"
+    agent_store: bool = False
+    growth_timers: bool = False
+    dormancy: bool = False
+    sparse_grid: bool = False
+    spatial_hash: bool = False
+
+    profiling: bool = False
+    profiling_sample_every: int = 1
+    collector_interval: int = 1
+    collector_buffer_size: int = 1024
+    collector_format: str = "csv"
+    events_capacity: int = 65536
+    events_sample_every: int = 1
+    events_format: str = "jsonl"
+    temperature_series: Optional[str] = None
+    forcing_period: int = 365
+
+    # conditions that stop a run early, see `StoppingCriteria`
+    stop_extinct: tuple = ()
+    stop_max_plankton_cover: Optional[float] = None
+    stop_steady_columns: tuple[str, ...] = ()
+    stop_period: int = 365
+    stop_tolerance: float = 0.05
+
+    # the file the config was read from, saved with checkpoints
+    path: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError(f"The grid must not be empty, it's {self.width}x{self.height}")
+        if self.min_allowed_temperature >= self.max_allowed_temperature:
+            raise ValueError(
+                "min_allowed_temperature must be lower than max_allowed_temperature"
+            )
+        for name in PROBABILITIES:
+            if not 0 <= getattr(self, name) <= 1:
+                raise ValueError(f"{name} must be between 0 and 1, not {getattr(self, name)}")
+        cover = self.stop_max_plankton_cover
+        if cover is not None and not 0 < cover <= 1:
+            raise ValueError(f"stop_max_plankton_cover must be between 0 and 1, not {cover}")
+        if self.plankton_engine not in PLANKTON_ENGINES:
+            raise ValueError(
+                f"Unknown plankton engine {self.plankton_engine!r}, use one of {PLANKTON_ENGINES}"
+            )
+
+    @classmethod
+    def from_dict(cls, config: dict, path: Optional[str] = None) -> "ModelConfig":
+        """
+        Returns the config of the contents of a config file.
+        """
+        profiling = config.get("profiling", {})
+        collector = config.get("datacollector", {})
+        events = config.get("events", {})
+        forcing = config.get("forcing", {})
+        stopping = config.get("stopping", {})
+        try:
+            return cls(
+                width=config["width"],
+                height=config["height"],
+                max_allowed_temperature=config["max_allowed_temperature"],
+                min_allowed_temperature=config["min_allowed_temperature"],
+                max_used_temperature=config["max_used_temperature"],
+                min_used_temperature=config["min_used_temperature"],
+                initial_population=dict(config["initial_population"]),
+                **{
+                    name: config[section][key]
+                    for name, (section, key) in SPECIES_PARAMETERS.items()
+                },
+                plankton_engine=config["plankton"].get("engine", "agents"),
+                agent_store=config.get("agent_store", False),
+                growth_timers=config.get("growth_timers", False),
+                dormancy=config.get("dormancy", False),
+                sparse_grid=config.get("sparse_grid", False),
+                spatial_hash=config.get("spatial_hash", False),
+                profiling=profiling.get("enabled", False),
+                profiling_sample_every=profiling.get("sample_every", 1),
+                collector_interval=collector.get("interval", 1),
+                collector_buffer_size=collector.get("buffer_size", 1024),
+                collector_format=collector.get("format", "csv"),
+                events_capacity=events.get("capacity", 65536),
+                events_sample_every=events.get("sample_every", 1),
+                events_format=events.get("format", "jsonl"),
+                temperature_series=forcing.get("temperature_series"),
+                forcing_period=forcing.get("period", 365),
+                stop_extinct=tuple(
+                    group if isinstance(group, str) else tuple(group)
+                    for group in stopping.get("extinct", ())
+                ),
+                stop_max_plankton_cover=stopping.get("max_plankton_cover"),
+                stop_steady_columns=tuple(stopping.get("steady_columns", ())),
+                stop_period=stopping.get("period", 365),
+                stop_tolerance=stopping.get("tolerance", 0.05),
+                path=path,
+            )
+        except KeyError as error:
+            raise ValueError(f"The config has no {error.args[0]!r}") from None
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "ModelConfig":
+        """
+        Returns the config of the fields of `dataclasses.asdict`, also after a
+        round trip through JSON, which turns tuples into lists.
+        """
+        return cls(
+            **{
+                **fields,
+                "stop_extinct": tuple(
+                    group if isinstance(group, str) else tuple(group)
+                    for group in fields.get("stop_extinct", ())
+                ),
+                "stop_steady_columns": tuple(fields.get("stop_steady_columns", ())),
+            }
+        )
+
+
+@lru_cache(maxsize=None)
+def _read_config(path: str, modified: int) -> ModelConfig:
+    with open(path) as file:
+        return ModelConfig.from_dict(json.load(file), path)
+
+
+def load_config(config_filepath: str) -> ModelConfig:
+    """
+    Returns the config of the file. The file is parsed once for all models
+    of the process, until it changes.
+    """
+    return _read_config(
+        os.path.abspath(config_filepath), os.stat(config_filepath).st_mtime_ns
+    )
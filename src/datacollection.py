@@ -0,0 +1,138 @@
+import glob
+import os
+from typing import Callable
+
+import mesa
+import numpy as np
+import pandas as pd
+
+
+class StreamingDataCollector:
+    """
+    A replacement for `mesa.DataCollector` that keeps only a bounded buffer in memory.
+
+    Model reporters are collected every `interval` steps into a columnar NumPy
+    buffer. A full buffer is appended to the output as one chunk:
+    - "csv" - rows appended to a single CSV file,
+    - "parquet" - one `part-<chunk>.parquet` file per chunk in a directory
+      (requires pyarrow).
+    Everything flushed so far is on disk, so it survives a crash of the run.
+    With `append`, data already in the output is kept and new data is added to it.
+
+    Example:
+    >>> collector = StreamingDataCollector({"Fish": count_fish}, "run.csv", interval=10)
+    >>> collector.collect(model)
+    >>> collector.close()
+    >>> collector.get_model_vars_dataframe()
+    """
+
+    FORMATS = ("csv", "parquet")
+
+    def __init__(
+        self,
+        model_reporters: dict[str, Callable[[mesa.Model], float]],
+        path: str,
+        buffer_size: int = 1024,
+        interval: int = 1,
+        file_format: str = "csv",
+        append: bool = False,
+    ) -> None:
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown format {file_format!r}, use one of {self.FORMATS}")
+        if file_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output requires pyarrow to be installed")
+
+        self.model_reporters = model_reporters
+        self.path = path
+        self.interval = interval
+        self.file_format = file_format
+        self.columns = ["Step", *model_reporters]
+
+        self._buffer = np.empty((buffer_size, len(self.columns)))
+        self._rows = 0
+        self._chunks = 0
+
+        if file_format == "csv":
+            if not (append and os.path.exists(path)):
+                with open(path, "w") as file:
+                    file.write(",".join(self.columns) + "\n")
+        else:
+            if not append:
+                for part in self._parts():
+                    os.remove(part)
+            os.makedirs(path, exist_ok=True)
+            self._chunks = len(self._parts())
+
+    def collect(self, model: mesa.Model) -> None:
+        if model.current_step % self.interval:
+            return
+
+        row = self._buffer[self._rows]
+        row[0] = model.current_step
+        for column, reporter in enumerate(self.model_reporters.values(), start=1):
+            row[column] = reporter(model)
+
+        self._rows += 1
+        if self._rows == len(self._buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Appends the buffered rows to the output.
+        """
+        if not self._rows:
+            return
+
+        rows = self._buffer[: self._rows]
+        if self.file_format == "csv":
+            with open(self.path, "a") as file:
+                np.savetxt(file, rows, delimiter=",", fmt="%.10g")
+        else:
+            pd.DataFrame(rows, columns=self.columns).to_parquet(
+                os.path.join(self.path, f"part-{self._chunks:05d}.parquet")
+            )
+
+        self._chunks += 1
+        self._rows = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        """
+        Reads all the collected data back, indexed by step.
+        """
+        if self.file_format == "csv":
+            frame = pd.read_csv(self.path)
+        else:
+            frame = pd.concat(
+                [pd.read_parquet(part) for part in self._parts()]
+                or [pd.DataFrame(columns=self.columns)]
+            )
+
+        buffered = pd.DataFrame(self._buffer[: self._rows], columns=self.columns)
+        frame = pd.concat([frame, buffered]) if len(buffered) else frame
+        frame["Step"] = frame["Step"].astype(int)
+        return frame.set_index("Step")
+
+    def truncate(self, step: int) -> None:
+        """
+        Drops data collected after the step, e.g. when resuming from a checkpoint.
+        """
+        self._rows = 0
+        frame = self.get_model_vars_dataframe()
+        frame = frame[frame.index <= step].reset_index()
+
+        if self.file_format == "csv":
+            frame.to_csv(self.path, index=False)
+        else:
+            for part in self._parts():
+                os.remove(part)
+            frame.to_parquet(os.path.join(self.path, "part-00000.parquet"))
+            self._chunks = 1
+
+    def _parts(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
@@ -0,0 +1,506 @@
+"""
+One large MarineEcosystem split across worker processes.
+
+The grid is split into horizontal strips of rows, each simulated by its own
+worker process with its own model and scheduler. Every strip also keeps
+`HALO` rows of each neighbouring strip (a halo), as wide as the largest radius
+agents look or move within. Before every step, workers publish the rows at
+their borders to shared memory:
+- counts of agents of every type, of all agents and of non-food agents,
+- the density of array plankton.
+
+Neighbours copy them into their halos. Agents then see across borders when
+they move, look for food or check crowding, but they only eat and mate with
+agents of their own strip. Agents that end a step in a halo move to the strip
+that owns the row, through the coordinating process. So does array plankton
+eaten or grown in a halo. Population counts are summed over all strips after
+every step.
+
+Results follow the same rules as a single model, but aren't identical to it:
+every strip has its own random streams.
+
+Example (from the `src` directory):
+    python distributed.py --workers 4 --steps 365 --output distributed.csv
+"""
+import argparse
+import os
+from dataclasses import replace
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from agents.animals import Animal
+from agents.food_source import Plankton
+from batch import CONFIG_FILE_PATH, INITIAL_POPULATION_PARAMETERS, default_parameters
+from checkpoint import AGENT_CLASSES, AGENT_FIELDS
+from config import ModelConfig, load_config
+from model import MarineEcosystem
+from stopping import StoppingCriteria
+
+# the largest radius in which agents look around or move (SeaTurtle)
+HALO = 5
+
+# shared border rows: counts of every agent class, of all agents, of non-food
+# agents and density of array plankton
+BORDER_LAYERS = (*AGENT_CLASSES, "agents_count", "non_food_count", "plankton_density")
+
+TOP, BOTTOM = 0, 1
+
+
+def split_rows(height: int, strips: int) -> list[tuple[int, int]]:
+    """
+    Returns the first and past-the-last row of every strip, as equal as possible.
+    """
+    bounds = np.linspace(0, height, strips + 1).round().astype(int)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+class StripModel(MarineEcosystem):
+    """
+    A MarineEcosystem of one strip of a larger grid, with halos of its neighbours.
+
+    The grid of the model spans the strip and its halos. Positions of agents
+    are local to it, `global_y` and `local_y` convert rows.
+    """
+
+    def __init__(
+        self,
+        config: ModelConfig,
+        index: int,
+        rows: tuple[int, int],
+        height: int,
+        **kwargs,
+    ) -> None:
+        self.index = index
+        self.first_row, self.end_row = rows
+        self.halo_top = min(HALO, self.first_row)
+        self.halo_bottom = min(HALO, height - self.end_row)
+        self.share = (self.end_row - self.first_row) / height
+        super().__init__(config, **kwargs)
+
+    @property
+    def owned(self) -> slice:
+        return slice(self.halo_top, self.halo_top + self.end_row - self.first_row)
+
+    def global_y(self, y: int) -> int:
+        return y + self.first_row - self.halo_top
+
+    def local_y(self, y: int) -> int:
+        return y - self.first_row + self.halo_top
+
+    def next_id(self) -> int:
+        # ids of agents are unique across all the strips
+        return (self.index << 40) + super().next_id()
+
+    def next_ids(self, count):
+        ids = super().next_ids(count)
+        return range((self.index << 40) + ids.start, (self.index << 40) + ids.stop)
+
+    def random_position(self):
+        return (
+            self.random.randrange(self.width),
+            self.random.randrange(self.owned.start, self.owned.stop),
+        )
+
+    def random_positions(self, size):
+        return (
+            self.rng.integers(self.width, size=size),
+            self.rng.integers(self.owned.start, self.owned.stop, size=size),
+        )
+
+    def spawn_plankton(self, attempts=5):
+        # the strip gets its share of plankton spawned in the whole grid
+        super().spawn_plankton(int(self.rng.binomial(attempts, self.share)))
+
+    def count_plankton(self):
+        if self.plankton_layer is not None:
+            return int(np.count_nonzero(self.plankton_layer.density[:, self.owned]))
+        return super().count_plankton()
+
+    def write_borders(self, borders: np.ndarray) -> None:
+        """
+        Writes the rows at both borders of the strip to the shared array.
+        """
+        owned = self.owned
+        rows = {
+            TOP: slice(owned.start, owned.start + HALO),
+            BOTTOM: slice(owned.stop - HALO, owned.stop),
+        }
+        borders[:] = 0
+        for side, row_slice in rows.items():
+            for layer, values in self._border_layers():
+                borders[side, layer] = values[:, row_slice]
+
+    def read_halos(self, above: Optional[np.ndarray], below: Optional[np.ndarray]) -> None:
+        """
+        Copies border rows of the neighbouring strips into the halos.
+        """
+        for layer, values in self._border_layers(create=True):
+            if above is not None:
+                values[:, : self.halo_top] = above[BOTTOM, layer, :, HALO - self.halo_top :]
+            if below is not None:
+                values[:, self.owned.stop :] = below[TOP, layer, :, : self.halo_bottom]
+
+        # cells next to the halos may have been vacated without agents leaving them here
+        self.grid.wake_rows(
+            [
+                *([self.owned.start] if above is not None else []),
+                *([self.owned.stop - 1] if below is not None else []),
+            ]
+        )
+
+        if self.plankton_layer is not None:
+            # plankton of the halos grows in its own strip
+            self.plankton_layer.time_to_grow[:, self._halo_rows()] = np.iinfo(np.int32).max
+
+    def _border_layers(self, create: bool = False) -> list[tuple[int, np.ndarray]]:
+        """
+        Returns arrays of the grid shared at borders with their indices in
+        `BORDER_LAYERS`, with `create` also counts of types not seen yet.
+        """
+        grid = self.grid
+        arrays = {
+            "agents_count": grid.agents_count,
+            "non_food_count": grid.non_food_count,
+        }
+        for name, agent_class in AGENT_CLASSES.items():
+            if create and agent_class not in grid.occupancy:
+                grid.occupancy[agent_class] = np.zeros(
+                    (grid.width, grid.height), dtype=np.int32
+                )
+            if agent_class in grid.occupancy:
+                arrays[name] = grid.occupancy[agent_class]
+        if self.plankton_layer is not None:
+            arrays["plankton_density"] = self.plankton_layer.density
+        return [
+            (layer, arrays[name])
+            for layer, name in enumerate(BORDER_LAYERS)
+            if name in arrays
+        ]
+
+    def _halo_rows(self) -> np.ndarray:
+        return np.r_[0 : self.halo_top, self.owned.stop : self.grid.height]
+
+    def emigrants(self) -> list[tuple]:
+        """
+        Removes agents that moved into the halos and returns their records.
+        """
+        records = []
+        rows = self._halo_rows()
+        xs, ys = np.nonzero(self.grid.agents_count[:, rows] > 0)
+        for x, y in zip(xs.tolist(), rows[ys].tolist()):
+            for agent in self.grid.get_cell_list_contents([(x, y)]):
+                records.append(agent_record(agent, x, self.global_y(y)))
+                if isinstance(agent, Animal):
+                    agent.remove()
+                else:
+                    self.grid.remove_agent(agent)
+                    self.schedule.remove(agent)
+        return records
+
+    def add_immigrants(self, records: list[tuple]) -> None:
+        for class_name, unique_id, x, y, fields in records:
+            agent_class = AGENT_CLASSES[class_name]
+            position = (x, self.local_y(y))
+            # plankton doesn't move, so it is new plankton that grew across the border
+            if agent_class is Plankton and not self.grid.is_cell_empty(position):
+                continue
+            agent = agent_class(unique_id, position, self)
+            for field, value in fields.items():
+                setattr(agent, field, agent.Sex(value) if field == "sex" else value)
+            self.grid.place_agent(agent, position)
+            self.schedule.add(agent)
+
+
+def agent_record(agent, x: int, y: int) -> tuple:
+    """
+    Returns the class, id, global position and state of the agent.
+    """
+    fields = {}
+    for field in AGENT_FIELDS:
+        if hasattr(agent, field):
+            value = getattr(agent, field)
+            if field == "sex":
+                value = value.value
+            # values kept in an AgentStore are NumPy scalars
+            fields[field] = value.item() if isinstance(value, np.generic) else value
+    return type(agent).__name__, agent.unique_id, x, y, fields
+
+
+def _run_worker(
+    connection,
+    index: int,
+    rows: tuple[int, int],
+    config: ModelConfig,
+    parameters: dict,
+    border_names: list[str],
+) -> None:
+    """
+    Runs a StripModel, answering commands of the DistributedMarineEcosystem.
+    """
+    width, height = config.width, config.height
+    strips = len(border_names)
+    memories = [SharedMemory(name=name) for name in border_names]
+    borders = [
+        np.ndarray((2, len(BORDER_LAYERS), width, HALO), buffer=memory.buf)
+        for memory in memories
+    ]
+
+    # runs stop on counts of the whole grid, which only the parent has, and
+    # halos are exchanged as counts, which only a dense grid without spatial
+    # hashes follows
+    strip_config = replace(
+        config,
+        height=rows[1] - rows[0] + min(HALO, rows[0]) + min(HALO, height - rows[1]),
+        stop_extinct=(),
+        stop_max_plankton_cover=None,
+        stop_steady_columns=(),
+        sparse_grid=False,
+        spatial_hash=False,
+    )
+    parameters = {
+        name: value
+        for name, value in parameters.items()
+        if not name.startswith("stop_") and name not in ("sparse_grid", "spatial_hash")
+    }
+    model = StripModel(strip_config, index, rows, height, **parameters)
+
+    layer = model.plankton_layer
+    while True:
+        command, payload = connection.recv()
+
+        if command == "publish":
+            records, (eaten_xs, eaten_ys), (grown_xs, grown_ys) = payload
+            model.add_immigrants(records)
+            if layer is not None:
+                layer.density[eaten_xs, model.local_y(eaten_ys)] = 0
+                layer.add(grown_xs, model.local_y(grown_ys))
+            model.write_borders(borders[index])
+            connection.send(None)
+
+        elif command == "step":
+            model.read_halos(
+                borders[index - 1] if index > 0 else None,
+                borders[index + 1] if index < strips - 1 else None,
+            )
+            if layer is not None:
+                halo_rows = model._halo_rows()
+                before = layer.density[:, halo_rows] > 0
+
+            model.step()
+
+            plankton = None
+            if layer is not None:
+                after = layer.density[:, halo_rows] > 0
+                eaten = np.nonzero(before & ~after)
+                grown = np.nonzero(~before & after)
+                plankton = (
+                    (eaten[0], model.global_y(halo_rows[eaten[1]])),
+                    (grown[0], model.global_y(halo_rows[grown[1]])),
+                )
+            counts = {
+                column: values[-1]
+                for column, values in model.datacollector.model_vars.items()
+            }
+            connection.send((model.emigrants(), plankton, counts))
+
+        elif command == "close":
+            model.events.close()
+            break
+
+    for memory in memories:
+        memory.close()
+    connection.close()
+
+
+class DistributedMarineEcosystem:
+    """
+    A MarineEcosystem whose grid is split into horizontal strips, each
+    simulated by a separate worker process, see the module's description.
+
+    Takes the same keyword arguments as MarineEcosystem.
+
+    Example:
+    >>> with DistributedMarineEcosystem("configs/config.json", workers=4, **parameters) as model:
+    ...     model.run(365)
+    ...     data = model.get_model_vars_dataframe()
+    """
+
+    def __init__(self, config_filepath: str, workers: Optional[int] = None, **kwargs) -> None:
+        config = load_config(config_filepath)
+        self.width = config.width
+        self.height = config.height
+
+        workers = workers or os.cpu_count()
+        # every strip has to be at least as high as the halos
+        workers = max(1, min(workers, self.height // HALO))
+        self.rows = split_rows(self.height, workers)
+
+        # initial populations are split between strips by their height
+        seeds = np.random.SeedSequence(kwargs.get("seed"))
+        rng = np.random.default_rng(seeds)
+        shares = [(end - start) / self.height for start, end in self.rows]
+        strip_parameters = [
+            {**kwargs, "seed": int(seed.generate_state(1)[0])}
+            for seed in seeds.spawn(workers)
+        ]
+        for parameter in INITIAL_POPULATION_PARAMETERS:
+            if parameter in kwargs:
+                for parameters, size in zip(
+                    strip_parameters, rng.multinomial(kwargs[parameter], shares)
+                ):
+                    parameters[parameter] = int(size)
+        for index, parameters in enumerate(strip_parameters):
+            if parameters.get("events_path") is not None:
+                parameters["events_path"] = f"{parameters['events_path']}.{index}"
+            # data of all strips is summed up here instead
+            parameters.pop("collector_path", None)
+
+        border_size = 2 * len(BORDER_LAYERS) * self.width * HALO * 8
+        self._borders = [SharedMemory(create=True, size=border_size) for _ in self.rows]
+        self._connections = []
+        self._workers = []
+        for index, rows in enumerate(self.rows):
+            connection, worker_connection = Pipe()
+            worker = Process(
+                target=_run_worker,
+                args=(
+                    worker_connection,
+                    index,
+                    rows,
+                    config,
+                    strip_parameters[index],
+                    [memory.name for memory in self._borders],
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+        self.current_step = 0
+        self.stopping = StoppingCriteria.from_config(
+            config, self.width * self.height, **kwargs
+        )
+        self.stop_reason = None
+        self.running = True
+        self.model_vars: list[dict] = []
+        self._inboxes = [self._empty_inbox() for _ in self.rows]
+
+    @staticmethod
+    def _empty_inbox():
+        empty = (np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+        return [], empty, empty
+
+    def _strip_of(self, ys: np.ndarray) -> np.ndarray:
+        return np.searchsorted([end for _, end in self.rows], ys, side="right")
+
+    def step(self) -> None:
+        """
+        Advances all the strips by one step.
+        """
+        for connection, inbox in zip(self._connections, self._inboxes):
+            connection.send(("publish", inbox))
+        for connection in self._connections:
+            connection.recv()
+
+        for connection in self._connections:
+            connection.send(("step", None))
+        results = [connection.recv() for connection in self._connections]
+
+        records = [[] for _ in self.rows]
+        eaten = [[] for _ in self.rows]
+        grown = [[] for _ in self.rows]
+        for emigrants, plankton, _ in results:
+            if emigrants:
+                strips = self._strip_of(np.array([record[3] for record in emigrants]))
+                for strip, record in zip(strips.tolist(), emigrants):
+                    records[strip].append(record)
+            if plankton is not None:
+                for cells, outbox in zip(plankton, (eaten, grown)):
+                    xs, ys = cells
+                    for strip in np.unique(self._strip_of(ys)).tolist():
+                        mask = self._strip_of(ys) == strip
+                        outbox[strip].append((xs[mask], ys[mask]))
+
+        def merge(cells):
+            if not cells:
+                return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+            return np.concatenate([xs for xs, _ in cells]), np.concatenate(
+                [ys for _, ys in cells]
+            )
+
+        self._inboxes = [
+            (records[strip], merge(eaten[strip]), merge(grown[strip]))
+            for strip in range(len(self.rows))
+        ]
+
+        self.current_step += 1
+        counts = {}
+        for _, _, strip_counts in results:
+            for column, value in strip_counts.items():
+                counts[column] = counts.get(column, 0) + value
+        self.model_vars.append(counts)
+
+        if self.stopping.enabled:
+            if self.current_step == 1:
+                self.stopping.validate(counts)
+            reason = self.stopping.check(self.current_step, counts)
+            if reason is not None:
+                self.running = False
+                self.stop_reason = reason
+
+    def run(self, steps: int) -> None:
+        while self.running and self.current_step < steps:
+            self.step()
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        """
+        Returns population counts of the whole grid, summed over all the strips.
+        """
+        frame = pd.DataFrame(self.model_vars)
+        frame.index = pd.RangeIndex(1, len(frame) + 1, name="Step")
+        return frame
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.send(("close", None))
+        for worker in self._workers:
+            worker.join()
+        for memory in self._borders:
+            memory.close()
+            memory.unlink()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._workers:
+            self.close()
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--config", default=CONFIG_FILE_PATH)
+    parser.add_argument("--steps", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="distributed.csv")
+    args = parser.parse_args(args)
+
+    parameters = default_parameters(args.config)
+    config_filepath = parameters.pop("config_filepath")
+    with DistributedMarineEcosystem(
+        config_filepath, workers=args.workers, seed=args.seed, **parameters
+    ) as model:
+        model.run(args.steps)
+        model.get_model_vars_dataframe().to_csv(args.output)
+    print(f"Finished {args.steps} steps on {len(model.rows)} strips, data in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
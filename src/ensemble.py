@@ -0,0 +1,161 @@
+"""
+Many seeds of one configuration of the MarineEcosystem, run together.
+
+All replicas live in one process and advance in lockstep, so they share
+what doesn't depend on the seed: the parsed config, the neighbourhood
+cache of the grid and the temperature table. After every step the
+population counts of all replicas are reduced to their mean, standard
+deviation and quantiles, and only this summary is kept, never the history
+of every replica.
+
+Example (from the `src` directory):
+    python ensemble.py --replicas 100 --steps 365 --output ensemble.csv
+"""
+import argparse
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from batch import CONFIG_FILE_PATH, default_parameters
+from model import MarineEcosystem
+
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+class Ensemble:
+    """
+    Replicas of a MarineEcosystem with different seeds, stepped together.
+
+    Takes the same keyword arguments as MarineEcosystem, except for the seed
+    and the path of collected data.
+    A replica that stops running no longer counts in the summary, the number
+    of replicas that made every step is its "replicas" column.
+
+    Example:
+    >>> ensemble = Ensemble("configs/config.json", seeds=range(100), **parameters)
+    >>> ensemble.run(365)
+    >>> summary = ensemble.get_summary_dataframe()
+    >>> summary["Fish"]["q0.95"]
+    """
+
+    def __init__(
+        self,
+        config_filepath: str,
+        seeds: Sequence[int],
+        quantiles: Sequence[float] = QUANTILES,
+        **kwargs,
+    ) -> None:
+        if kwargs.get("collector_path") is not None:
+            raise ValueError("Replicas of an ensemble collect their counts in memory")
+        kwargs.pop("seed", None)
+        self.seeds = list(seeds)
+        self.quantiles = tuple(quantiles)
+        self.replicas = [
+            MarineEcosystem(config_filepath, seed=seed, **kwargs) for seed in self.seeds
+        ]
+        self.columns = list(self.replicas[0].datacollector.model_reporters)
+
+        self.current_step = 0
+        self.running = True
+        # per step: number of replicas, then a row of every statistic
+        self._counts: list[int] = []
+        self._statistics: list[np.ndarray] = []
+
+    @property
+    def statistics(self) -> list[str]:
+        return ["mean", "std", *(f"q{quantile:g}" for quantile in self.quantiles)]
+
+    def step(self) -> None:
+        """
+        Advances every running replica by one step and summarizes their counts.
+        """
+        rows = []
+        for replica in self.replicas:
+            if not replica.running:
+                continue
+            replica.step()
+            model_vars = replica.datacollector.model_vars
+            rows.append([values[-1] for values in model_vars.values()])
+            # only the latest counts are needed, the summary keeps the rest
+            for values in model_vars.values():
+                values.clear()
+
+        self.current_step += 1
+        self.running = any(replica.running for replica in self.replicas)
+        self._counts.append(len(rows))
+        self._statistics.append(self._summarize(np.array(rows, dtype=np.float64)))
+
+    def _summarize(self, values: np.ndarray) -> np.ndarray:
+        """
+        Returns statistics of counts of the replicas, one row per statistic.
+        """
+        if not len(values):
+            return np.full((len(self.statistics), len(self.columns)), np.nan)
+        return np.vstack(
+            [
+                values.mean(axis=0),
+                values.std(axis=0, ddof=1) if len(values) > 1 else np.zeros(len(self.columns)),
+                np.quantile(values, self.quantiles, axis=0).reshape(-1, len(self.columns)),
+            ]
+        )
+
+    def run(self, steps: int) -> None:
+        while self.running and self.current_step < steps:
+            self.step()
+
+    def get_summary_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the summary indexed by step, with a column of every statistic
+        under every population column and the number of replicas.
+        """
+        index = pd.RangeIndex(1, self.current_step + 1, name="Step")
+        statistics = np.array(self._statistics).reshape(
+            self.current_step, len(self.statistics), len(self.columns)
+        )
+        frame = pd.DataFrame(
+            statistics.transpose(0, 2, 1).reshape(self.current_step, -1),
+            index=index,
+            columns=pd.MultiIndex.from_product([self.columns, self.statistics]),
+        )
+        frame.insert(0, ("replicas", "count"), self._counts)
+        return frame
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.events.close()
+
+
+def read_summary(path: str) -> pd.DataFrame:
+    """
+    Reads a summary written by `ensemble.py`.
+    """
+    return pd.read_csv(path, header=[0, 1], index_col=0)
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--config", default=CONFIG_FILE_PATH)
+    parser.add_argument("--steps", type=int, default=365)
+    parser.add_argument("--replicas", type=int, default=50)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--quantiles", type=float, nargs="+", default=list(QUANTILES))
+    parser.add_argument("--output", default="ensemble.csv")
+    args = parser.parse_args(args)
+
+    parameters = default_parameters(args.config)
+    config_filepath = parameters.pop("config_filepath")
+    ensemble = Ensemble(
+        config_filepath,
+        seeds=range(args.first_seed, args.first_seed + args.replicas),
+        quantiles=args.quantiles,
+        **parameters,
+    )
+    ensemble.run(args.steps)
+    ensemble.close()
+    ensemble.get_summary_dataframe().to_csv(args.output)
+    print(f"Finished {ensemble.current_step} steps of {args.replicas} replicas, summary in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
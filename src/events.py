@@ -0,0 +1,284 @@
+import os
+from collections import defaultdict
+from enum import IntEnum
+from typing import Optional
+
+import mesa
+import numpy as np
+import pandas as pd
+
+
+class EventType(IntEnum):
+    BIRTH = 0
+    DEATH = 1
+    PREDATION = 2
+    MATING = 3
+    STROBILATION = 4
+    METAMORPHOSIS = 5
+
+
+class DeathCause(IntEnum):
+    NONE = 0
+    STARVATION = 1
+    PREDATION = 2
+    # a larva ends as it turns into a polyp
+    METAMORPHOSIS = 3
+
+
+# species are stored as their index here, -1 when there is no other agent
+SPECIES = (
+    "JellyfishMedusa",
+    "JellyfishPolyp",
+    "JellyfishLarva",
+    "SeaTurtle",
+    "Fish",
+    "Plankton",
+)
+SPECIES_CODES = {name: code for code, name in enumerate(SPECIES)}
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("step", np.int64),
+        ("type", np.int8),
+        ("species", np.int8),
+        ("agent", np.int64),
+        ("other_species", np.int8),
+        ("other", np.int64),
+        ("x", np.int32),
+        ("y", np.int32),
+        ("cause", np.int8),
+    ]
+)
+
+
+class EventLog:
+    """
+    Typed events of a model's agents: births, deaths by cause, predation,
+    mating, strobilation and metamorphosis.
+
+    Every event is counted. Every `sample_every`-th event of each type is also
+    kept with its details in a preallocated buffer of `capacity` events.
+    Without a sink, the buffer is a ring keeping the latest events. With a path
+    of a sink, a full buffer is appended to it:
+    - "jsonl" - one JSON object per line,
+    - "binary" - raw records of `EVENT_DTYPE`, read with `read_events`.
+
+    Example:
+    >>> events = EventLog(model, sample_every=10, path="events.jsonl")
+    >>> events.record(EventType.DEATH, fish, cause=DeathCause.STARVATION)
+    >>> events.count(EventType.DEATH, "Fish", DeathCause.STARVATION)
+    >>> events.close()
+    """
+
+    FORMATS = ("jsonl", "binary")
+
+    def __init__(
+        self,
+        model: mesa.Model,
+        capacity: int = 65536,
+        sample_every: int = 1,
+        path: Optional[str] = None,
+        file_format: str = "jsonl",
+        append: bool = False,
+    ) -> None:
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown format {file_format!r}, use one of {self.FORMATS}")
+
+        self.model = model
+        self.sample_every = sample_every
+        self.path = path
+        self.file_format = file_format
+
+        # (event type, species, cause) -> number of events
+        self.counts: defaultdict[tuple[int, str, int], int] = defaultdict(int)
+        self._seen = [0] * len(EventType)
+
+        self._buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self._size = 0
+        self._next = 0
+
+        if path is not None and not (append and os.path.exists(path)):
+            open(path, "w").close()
+
+    def record(
+        self,
+        event_type: EventType,
+        agent: mesa.Agent,
+        other: Optional[mesa.Agent] = None,
+        cause: DeathCause = DeathCause.NONE,
+        other_species: Optional[str] = None,
+    ) -> None:
+        """
+        Records an event of the agent, optionally involving another agent,
+        e.g. the prey of a predation or the parent of a birth. `other_species`
+        names the other party when it isn't an agent, e.g. array plankton.
+        """
+        species = type(agent).__name__
+        self.counts[event_type, species, cause] += 1
+
+        seen = self._seen[event_type]
+        self._seen[event_type] = seen + 1
+        if seen % self.sample_every or not len(self._buffer):
+            return
+
+        if other is not None:
+            other_species = type(other).__name__
+        x, y = agent.position
+        self._buffer[self._next] = (
+            self.model.current_step,
+            event_type,
+            SPECIES_CODES.get(species, -1),
+            agent.unique_id,
+            SPECIES_CODES.get(other_species, -1),
+            other.unique_id if other is not None else -1,
+            x,
+            y,
+            cause,
+        )
+        self._next += 1
+        self._size = max(self._size, self._next)
+        if self._next == len(self._buffer):
+            if self.path is not None:
+                self.flush()
+            else:
+                self._next = 0
+
+    def count(
+        self,
+        event_type: EventType,
+        species: Optional[str] = None,
+        cause: Optional[DeathCause] = None,
+    ) -> int:
+        """
+        Returns the number of events of the type so far, optionally only
+        of agents of a species and of deaths of a cause.
+        """
+        return sum(
+            count
+            for (counted_type, counted_species, counted_cause), count in self.counts.items()
+            if counted_type == event_type
+            and (species is None or counted_species == species)
+            and (cause is None or counted_cause == cause)
+        )
+
+    def _buffered(self) -> np.ndarray:
+        """
+        Returns the buffered events, the oldest first.
+        """
+        if self._size < len(self._buffer):
+            return self._buffer[: self._size]
+        return np.concatenate([self._buffer[self._next :], self._buffer[: self._next]])
+
+    def flush(self) -> None:
+        """
+        Appends the buffered events to the sink.
+        """
+        if self.path is None or not self._size:
+            return
+
+        events = self._buffered()
+        if self.file_format == "binary":
+            with open(self.path, "ab") as file:
+                events.tofile(file)
+        else:
+            with open(self.path, "a") as file:
+                write_jsonl(events_to_dataframe(events), file)
+
+        self._size = 0
+        self._next = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    def get_events_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the recorded events, also the ones already in the sink.
+        """
+        frame = events_to_dataframe(self._buffered())
+        if self.path is None:
+            return frame
+        return pd.concat([read_events(self.path, self.file_format), frame], ignore_index=True)
+
+    def truncate(self, step: int) -> None:
+        """
+        Drops events of the sink recorded after the step, e.g. when resuming
+        from a checkpoint.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        if self.file_format == "binary":
+            events = np.fromfile(self.path, dtype=EVENT_DTYPE)
+            events[events["step"] <= step].tofile(self.path)
+        else:
+            frame = read_events(self.path, "jsonl")
+            with open(self.path, "w") as file:
+                write_jsonl(frame[frame["step"] <= step], file)
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """
+        Returns the counts and the buffer as arrays, e.g. for a checkpoint.
+        """
+        counts = list(self.counts.items())
+        return {
+            "count_keys": np.array(
+                [
+                    (event_type, SPECIES_CODES[species], cause)
+                    for (event_type, species, cause), _ in counts
+                ],
+                dtype=np.int64,
+            ).reshape(-1, 3),
+            "count_values": np.array([count for _, count in counts], dtype=np.int64),
+            "seen": np.array(self._seen, dtype=np.int64),
+            "buffer": self._buffered(),
+        }
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        self.counts.clear()
+        for (event_type, species, cause), count in zip(
+            state["count_keys"].tolist(), state["count_values"].tolist()
+        ):
+            self.counts[EventType(event_type), SPECIES[species], DeathCause(cause)] = count
+        self._seen = state["seen"].tolist()
+
+        buffer = state["buffer"][-len(self._buffer) :] if len(self._buffer) else []
+        self._size = self._next = len(buffer)
+        self._buffer[: len(buffer)] = buffer
+        if self._next == len(self._buffer):
+            self._next = 0
+
+
+def events_to_dataframe(events: np.ndarray) -> pd.DataFrame:
+    """
+    Returns the event records with names of types, species and causes.
+    """
+    species = np.array([*SPECIES, None], dtype=object)
+    return pd.DataFrame(
+        {
+            "step": events["step"],
+            "type": [EventType(value).name.lower() for value in events["type"].tolist()],
+            "species": species[events["species"]],
+            "agent": events["agent"],
+            "other_species": species[events["other_species"]],
+            "other": events["other"],
+            "x": events["x"],
+            "y": events["y"],
+            "cause": [DeathCause(value).name.lower() for value in events["cause"].tolist()],
+        }
+    )
+
+
+def write_jsonl(frame: pd.DataFrame, file) -> None:
+    if len(frame):
+        file.write(frame.to_json(orient="records", lines=True).rstrip("\n") + "\n")
+
+
+def read_events(path: str, file_format: str = "jsonl") -> pd.DataFrame:
+    """
+    Reads events written by an EventLog.
+    """
+    if file_format == "binary":
+        return events_to_dataframe(np.fromfile(path, dtype=EVENT_DTYPE))
+    if not os.path.getsize(path):
+        return events_to_dataframe(np.zeros(0, dtype=EVENT_DTYPE))
+    return pd.read_json(path, lines=True)
@@ -0,0 +1,158 @@
+import math
+import os
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class Conditions(NamedTuple):
+    """
+    Temperature of a step and the rates that depend on it.
+    """
+
+    temperature: float
+    # how far the temperature is between the allowed minimum and maximum, 0 to 1
+    plankton_growth: float
+    # whether and how likely new plankton is spawned
+    plankton_spawn_probability: float
+
+
+class Forcing:
+    """
+    Temperature of every step of a run, with the rates derived from it,
+    looked up instead of being computed by the model and its agents.
+
+    A seasonal forcing is a table of one period (a year of 365 steps) of
+    a sinusoid between the used minimum and maximum, repeated for as long
+    as the run goes. An external forcing is a series of temperatures, one
+    per step from the first one, read from a `.npy` file, which is
+    memory-mapped so multi-decade series aren't read into memory, or from
+    a CSV file, which is read once.
+
+    Example:
+    >>> forcing = Forcing.seasonal(10, 20, 0, 30)
+    >>> forcing.at(model.current_step).temperature
+    >>> forcing = Forcing.from_file("temperatures.npy", 0, 30)
+    """
+
+    def __init__(
+        self,
+        temperatures: np.ndarray,
+        min_allowed_temperature: float,
+        max_allowed_temperature: float,
+        cyclic: bool = False,
+        first_step: int = 1,
+    ) -> None:
+        self.temperatures = temperatures
+        self.min_allowed_temperature = min_allowed_temperature
+        self.max_allowed_temperature = max_allowed_temperature
+        self.cyclic = cyclic
+        self.first_step = first_step
+
+        # a table short enough to be kept with all its rates
+        self._table = (
+            [self.conditions(temperature) for temperature in temperatures.tolist()]
+            if cyclic
+            else None
+        )
+
+    @classmethod
+    def seasonal(
+        cls,
+        min_used_temperature: float,
+        max_used_temperature: float,
+        min_allowed_temperature: float,
+        max_allowed_temperature: float,
+        period: int = 365,
+    ) -> "Forcing":
+        """
+        Returns the forcing of a sinusoidal yearly cycle, starting at the
+        middle of the used range at step 0.
+        """
+        amplitude = float(max_used_temperature - min_used_temperature) / 2
+        middle = float(max_used_temperature + min_used_temperature) / 2
+        temperatures = np.array(
+            [
+                amplitude * math.sin(2 * math.pi * step / period) + middle
+                for step in range(period)
+            ]
+        )
+        return cls(
+            temperatures,
+            min_allowed_temperature,
+            max_allowed_temperature,
+            cyclic=True,
+            first_step=0,
+        )
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str,
+        min_allowed_temperature: float,
+        max_allowed_temperature: float,
+        column: str = "temperature",
+    ) -> "Forcing":
+        """
+        Returns the forcing of temperatures in a `.npy` file or in `column`
+        (or the only column) of a CSV file, the first of them being the
+        temperature of the first step.
+        """
+        if os.path.splitext(path)[1] == ".npy":
+            temperatures = np.load(path, mmap_mode="r")
+        else:
+            frame = pd.read_csv(path)
+            temperatures = frame[column if column in frame else frame.columns[-1]]
+            temperatures = temperatures.to_numpy(dtype=np.float64)
+        return cls(temperatures, min_allowed_temperature, max_allowed_temperature)
+
+    def __len__(self) -> int:
+        return len(self.temperatures)
+
+    def conditions(self, temperature: float) -> Conditions:
+        """
+        Returns the rates at the temperature.
+        """
+        allowed_range = self.max_allowed_temperature - self.min_allowed_temperature
+        return Conditions(
+            temperature,
+            (temperature - self.min_allowed_temperature) / allowed_range,
+            math.sin(math.pi / 2 * temperature / allowed_range),
+        )
+
+    def at(self, step: int) -> Conditions:
+        """
+        Returns the temperature and rates of the step.
+        """
+        index = step - self.first_step
+        if self._table is not None:
+            return self._table[index % len(self._table)]
+        if not 0 <= index < len(self.temperatures):
+            raise ValueError(
+                f"The temperature series has {len(self.temperatures)} steps, "
+                f"there is no temperature of step {step}"
+            )
+        return self.conditions(float(self.temperatures[index]))
+
+
+@lru_cache(maxsize=None)
+def seasonal_forcing(
+    min_used_temperature: float,
+    max_used_temperature: float,
+    min_allowed_temperature: float,
+    max_allowed_temperature: float,
+    period: int = 365,
+) -> Forcing:
+    """
+    Returns the seasonal forcing, built once and shared by all models of
+    the process with the same temperatures, e.g. replicas of an ensemble.
+    """
+    return Forcing.seasonal(
+        min_used_temperature,
+        max_used_temperature,
+        min_allowed_temperature,
+        max_allowed_temperature,
+        period,
+    )
@@ -0,0 +1,161 @@
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import mesa
+import numpy as np
+
+from agents.animals import Fish, JellyfishLarva, JellyfishMedusa, JellyfishPolyp, SeaTurtle
+from agents.food_source import Plankton
+
+# bits of a cell's code: plankton, the animal drawn on top, its sprite and size
+PLANKTON_BIT = 0b1
+SPECIES_SHIFT = 1
+SPECIES_MASK = 0b1110
+SPRITE_BIT = 0b10000
+LARGE_BIT = 0b100000
+
+# animals in the order they are drawn, later ones on top
+SPECIES_CODES = {
+    JellyfishLarva: 1,
+    JellyfishPolyp: 2,
+    JellyfishMedusa: 3,
+    Fish: 4,
+    SeaTurtle: 5,
+}
+
+# header of a shared frame: sequence number (odd while being written) and step
+HEADER = np.dtype([("sequence", np.int64), ("step", np.int64)])
+
+# attempts of a read to find the frame not being written
+READ_ATTEMPTS = 1000
+
+
+class FrameBuffer:
+    """
+    What the model looks like, one byte per cell in a `height x width` array.
+
+    Rows go from the top of the view (the highest y) to the bottom. A code is:
+    - PLANKTON_BIT - the cell has plankton,
+    - bits under SPECIES_MASK - code of the animal drawn in the cell, from SPECIES_CODES,
+    - SPRITE_BIT - which of the two sprites of the species the animal has,
+    - LARGE_BIT - the animal is drawn large (mature fish).
+
+    With `shared`, the frame lives in `multiprocessing.shared_memory` under
+    `name`, so another process can read it with `FrameBuffer.attach` without
+    copying the model.
+
+    Example:
+    >>> frame = FrameBuffer(model, shared=True)
+    >>> frame.update()
+    >>> reader = FrameBuffer.attach(frame.name, model.width, model.height)
+    >>> step, codes = reader.read()
+    """
+
+    def __init__(
+        self,
+        model: Optional[mesa.Model],
+        shared: bool = False,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        self.model = model
+        self.width = model.width if model is not None else width
+        self.height = model.height if model is not None else height
+
+        size = HEADER.itemsize + self.width * self.height
+        self._memory = None
+        self._created = name is None
+        if shared or name is not None:
+            self._memory = SharedMemory(name=name, create=name is None, size=size)
+            if not self._created:
+                # only the process that created the frame removes it
+                resource_tracker.unregister(self._memory._name, "shared_memory")
+            buffer = self._memory.buf
+        else:
+            buffer = bytearray(size)
+        self.header = np.ndarray((), dtype=HEADER, buffer=buffer)
+        self.codes = np.ndarray(
+            (self.height, self.width), dtype=np.uint8, buffer=buffer, offset=HEADER.itemsize
+        )
+        # the last frame read whole, returned while the writer is busy
+        self._last_read: Optional[tuple[int, np.ndarray]] = None
+        if self._created:
+            self.header["sequence"] = 0
+            self.header["step"] = -1
+            self.codes[:] = 0
+
+    @classmethod
+    def attach(cls, name: str, width: int, height: int) -> "FrameBuffer":
+        """
+        Opens a shared frame published by another process.
+        """
+        return cls(None, width=width, height=height, name=name)
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._memory.name if self._memory is not None else None
+
+    @property
+    def step(self) -> int:
+        return int(self.header["step"])
+
+    def update(self) -> None:
+        """
+        Draws the current state of the model into the frame.
+        """
+        grid = self.model.grid
+        # [x, y] arrays of the grid, as rows from the top of the view
+        cells = np.zeros((self.width, self.height), dtype=np.uint8)
+
+        cells[grid.type_mask(Plankton)] = PLANKTON_BIT
+        if self.model.plankton_layer is not None:
+            cells[self.model.plankton_layer.density > 0] = PLANKTON_BIT
+
+        for species, code in SPECIES_CODES.items():
+            for agent in self.model.schedule.agents_by_type.get(species, {}).values():
+                cells[agent.pos] = (
+                    (cells[agent.pos] & PLANKTON_BIT)
+                    | code << SPECIES_SHIFT
+                    | (SPRITE_BIT if agent.sprite else 0)
+                    | (LARGE_BIT if species is Fish and agent.is_mature() else 0)
+                )
+
+        self.header["sequence"] += 1
+        self.codes[:] = cells.T[::-1]
+        self.header["step"] = self.model.current_step
+        self.header["sequence"] += 1
+
+    def read(self, attempts: int = READ_ATTEMPTS) -> Optional[tuple[int, np.ndarray]]:
+        """
+        Returns the step and a copy of the frame, which is never half-written.
+
+        While the frame is being written, the writer is let run between the
+        attempts. If none of them finds the frame whole, e.g. because the
+        writer died in the middle of an update, the last frame read is
+        returned instead, or None if there wasn't any.
+        """
+        for _ in range(attempts):
+            sequence = int(self.header["sequence"])
+            if sequence % 2 == 0:
+                step = int(self.header["step"])
+                codes = self.codes.copy()
+                if int(self.header["sequence"]) == sequence:
+                    self._last_read = step, codes
+                    return self._last_read
+            time.sleep(0)
+        return self._last_read
+
+    def close(self) -> None:
+        """
+        Releases the shared memory, removing it when this is the frame that created it.
+        """
+        if self._memory is None:
+            return
+        del self.header, self.codes
+        self._memory.close()
+        if self._created:
+            self._memory.unlink()
+        self._memory = None
@@ -0,0 +1,33 @@
+import base64
+
+import mesa
+
+
+class FrameCanvas(mesa.visualization.VisualizationElement):
+    """
+    A canvas drawing the model's FrameBuffer, instead of a portrayal of every agent.
+
+    Every frame is sent as one byte per cell, which the browser decodes and
+    draws with the same sprites as `agent_portrayal`.
+    """
+
+    local_includes = ["FrameCanvasModule.js"]
+    local_dir = "resources"
+
+    def __init__(self, grid_width, grid_height, canvas_width=500, canvas_height=500):
+        super().__init__()
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.js_code = (
+            f"elements.push(new FrameCanvasModule({canvas_width}, {canvas_height}, "
+            f"{grid_width}, {grid_height}));"
+        )
+
+    def render(self, model):
+        frame = model.frame_buffer
+        if frame is None:
+            frame = model.enable_frame_buffer()
+        return {
+            "step": frame.step,
+            "codes": base64.b64encode(frame.codes.tobytes()).decode("ascii"),
+        }
@@ -0,0 +1,33 @@
+"""
+Makes `import mesa` not load Mesa's browser visualization.
+
+Mesa imports `mesa.visualization`, and with it tornado and its server, as
+soon as any part of it is imported, and networkx for its NetworkGrid.
+Imported before Mesa, this module puts placeholders in their place, which
+import the real modules on the first use of one of their attributes, e.g.
+by `server.py`. Headless runs never use them, so they start without them.
+"""
+import importlib
+import sys
+import types
+
+LAZY_MODULES = ("mesa.visualization", "networkx")
+
+
+class LazyModule(types.ModuleType):
+    """
+    A module imported on the first use of one of its attributes.
+    """
+
+    def __getattr__(self, attribute: str):
+        if sys.modules.get(self.__name__) is self:
+            del sys.modules[self.__name__]
+        module = importlib.import_module(self.__name__)
+        # later uses of the placeholder, e.g. as `mesa.visualization`, skip this
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+if "mesa" not in sys.modules:
+    for name in LAZY_MODULES:
+        sys.modules.setdefault(name, LazyModule(name))
@@ -0,0 +1,283 @@
+"""
+A browser view of a model running at full speed in a background process.
+
+Unlike `server.py`, where the browser asks for every step, the model here
+runs on its own in a worker process and draws itself into a shared
+FrameBuffer every `--steps-per-frame` steps. Every browser gets the latest
+frame and the population counts collected since its previous frame, at most
+`--fps` times a second, so watching a run doesn't slow it down.
+
+Example (from the `src` directory):
+    python live_server.py --steps-per-frame 10 --fps 5
+"""
+import argparse
+import base64
+import json
+import os
+import queue
+from multiprocessing import Pipe, Process, Queue
+from typing import Optional
+
+import tornado.ioloop
+import tornado.web
+import tornado.websocket
+from mesa_viz_tornado import ModularVisualization
+from mesa_viz_tornado.ModularVisualization import CHART_JS_FILE
+
+from batch import CONFIG_FILE_PATH, default_parameters
+from config import load_config
+from frame_buffer import FrameBuffer
+from model import MarineEcosystem
+from portrayals import CHART_SERIES
+
+# how often the server takes what the worker has published, in ms
+UPDATES_INTERVAL = 50
+
+# counts of the latest steps kept for the charts of browsers, e.g. opened later
+ROWS_KEPT = 3650
+
+
+def run_model(parameters: dict, steps_per_frame: int, commands, updates: Queue) -> None:
+    """
+    Steps models in the worker process until told to stop.
+
+    Commands are "pause", "resume", "reset" and "stop". Updates are
+    ("reset", frame name, columns) for every new model and ("rows", rows)
+    with the counts collected since the previous frame.
+    """
+    model: Optional[MarineEcosystem] = None
+    paused = False
+    rows = []
+
+    def reset() -> MarineEcosystem:
+        if model is not None:
+            model.frame_buffer.close()
+        new_model = MarineEcosystem(**parameters)
+        frame = new_model.enable_frame_buffer(shared=True, interval=steps_per_frame)
+        updates.put(("reset", frame.name, list(new_model.datacollector.model_reporters)))
+        return new_model
+
+    model = reset()
+    while True:
+        if paused or not model.running:
+            command = commands.recv()
+        else:
+            command = commands.recv() if commands.poll() else None
+
+        if command == "stop":
+            break
+        elif command == "pause":
+            paused = True
+        elif command == "resume":
+            paused = False
+        elif command == "reset":
+            model = reset()
+            rows = []
+        elif command is None:
+            model.step()
+            model_vars = model.datacollector.model_vars
+            rows.append([model.current_step, *(values[-1] for values in model_vars.values())])
+            # the server keeps the counts, the model doesn't need them
+            for values in model_vars.values():
+                values.clear()
+            if model.current_step % steps_per_frame == 0 or not model.running:
+                updates.put(("rows", rows))
+                rows = []
+
+    model.frame_buffer.close()
+
+
+class LiveModel:
+    """
+    The worker process running the model and everything it has published so far.
+    """
+
+    def __init__(self, parameters: dict, steps_per_frame: int) -> None:
+        config = load_config(parameters["config_filepath"])
+        self.width = config.width
+        self.height = config.height
+
+        self.commands, worker_commands = Pipe()
+        self.updates = Queue()
+        self.process = Process(
+            target=run_model,
+            args=(parameters, steps_per_frame, worker_commands, self.updates),
+            daemon=True,
+        )
+        self.process.start()
+
+        self.frame: Optional[FrameBuffer] = None
+        self.columns: list[str] = []
+        # counts of the latest steps, the first of them is row `first_row` of the model
+        self.rows: list[list] = []
+        self.first_row = 0
+        # increased with every new model, so browsers know to start over
+        self.generation = 0
+
+    def poll(self) -> None:
+        """
+        Takes in everything the worker has published.
+        """
+        while True:
+            try:
+                update = self.updates.get_nowait()
+            except queue.Empty:
+                return
+
+            if update[0] == "reset":
+                _, name, self.columns = update
+                if self.frame is not None:
+                    self.frame.close()
+                self.frame = FrameBuffer.attach(name, self.width, self.height)
+                self.rows = []
+                self.first_row = 0
+                self.generation += 1
+            else:
+                self.rows.extend(update[1])
+                if len(self.rows) > ROWS_KEPT:
+                    self.first_row += len(self.rows) - ROWS_KEPT
+                    del self.rows[: len(self.rows) - ROWS_KEPT]
+
+    def rows_since(self, row: int) -> list[list]:
+        """
+        Returns the counts from row `row` of the model on, those not kept
+        any longer are skipped.
+        """
+        return self.rows[max(row - self.first_row, 0) :]
+
+    def send(self, command: str) -> None:
+        self.commands.send(command)
+
+    def close(self) -> None:
+        self.send("stop")
+        self.process.join()
+        if self.frame is not None:
+            self.frame.close()
+
+
+class PageHandler(tornado.web.RequestHandler):
+    def get(self):
+        live = self.application.live
+        scale = self.application.cell_size
+        self.render(
+            "live.html",
+            canvas_width=live.width * scale,
+            canvas_height=live.height * scale,
+            grid_width=live.width,
+            grid_height=live.height,
+            series=CHART_SERIES,
+            chart_js=CHART_JS_FILE,
+            fps=self.application.fps,
+        )
+
+
+class LiveSocketHandler(tornado.websocket.WebSocketHandler):
+    """
+    Sends frames to one browser at its frame rate, skipping frames while
+    the previous one is still being sent.
+    """
+
+    def open(self):
+        self.generation = None
+        self.sent_step = None
+        self.sent_rows = 0
+        self.sending = None
+        self.callback = None
+        self.set_fps(self.application.fps)
+
+    def set_fps(self, fps: float) -> None:
+        if self.callback is not None:
+            self.callback.stop()
+        self.callback = tornado.ioloop.PeriodicCallback(self.send_frame, 1000 / fps)
+        self.callback.start()
+
+    def on_message(self, message):
+        message = json.loads(message)
+        if message["type"] in ("pause", "resume", "reset"):
+            self.application.live.send(message["type"])
+        elif message["type"] == "fps":
+            self.set_fps(float(message["value"]))
+
+    def send_frame(self) -> None:
+        live = self.application.live
+        if live.frame is None or (self.sending is not None and not self.sending.done()):
+            return
+
+        message = {"type": "frame"}
+        if self.generation != live.generation:
+            self.generation = live.generation
+            self.sent_step = None
+            self.sent_rows = 0
+            message["reset"] = True
+            message["columns"] = live.columns
+
+        frame = live.frame.read()
+        if frame is not None and frame[0] != self.sent_step:
+            step, codes = frame
+            self.sent_step = step
+            message["step"] = step
+            message["codes"] = base64.b64encode(codes.tobytes()).decode("ascii")
+
+        message["rows"] = live.rows_since(self.sent_rows)
+        self.sent_rows = live.first_row + len(live.rows)
+
+        if len(message) > 2 or message["rows"]:
+            try:
+                self.sending = self.write_message(message)
+            except tornado.websocket.WebSocketClosedError:
+                self.callback.stop()
+
+    def on_close(self):
+        self.callback.stop()
+
+
+class LiveServer(tornado.web.Application):
+    def __init__(
+        self,
+        parameters: dict,
+        steps_per_frame: int = 1,
+        fps: float = 10,
+        cell_size: int = 8,
+    ) -> None:
+        self.live = LiveModel(parameters, steps_per_frame)
+        self.fps = fps
+        self.cell_size = cell_size
+        # Chart.js and styles of Mesa's own server
+        static_path = os.path.join(os.path.dirname(ModularVisualization.__file__), "templates")
+        super().__init__(
+            [
+                (r"/", PageHandler),
+                (r"/ws", LiveSocketHandler),
+                (r"/static/(.*)", tornado.web.StaticFileHandler, {"path": static_path}),
+                (r"/local/custom/(.*)", tornado.web.StaticFileHandler, {"path": "."}),
+            ],
+            template_path="resources",
+        )
+
+    def launch(self, port: int) -> None:
+        print(f"Interface starting at http://127.0.0.1:{port}")
+        self.listen(port)
+        tornado.ioloop.PeriodicCallback(self.live.poll, UPDATES_INTERVAL).start()
+        try:
+            tornado.ioloop.IOLoop.current().start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.live.close()
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--config", default=CONFIG_FILE_PATH)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--steps-per-frame", type=int, default=1)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8522)
+    args = parser.parse_args(args)
+
+    parameters = {**default_parameters(args.config), "seed": args.seed}
+    LiveServer(parameters, args.steps_per_frame, args.fps).launch(args.port)
+
+
+if __name__ == "__main__":
+    main()
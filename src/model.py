@@ -1,13 +1,26 @@
 import math
-from random import Random
 
+# before Mesa, so it doesn't load its visualization
+import lazy_imports  # noqa: F401
 import mesa
+import numpy as np
 
-from agents.food_source import *
-from agents.animals import *
-import json
+from agents.animals import Fish, JellyfishLarva, JellyfishMedusa, JellyfishPolyp, SeaTurtle
+from agents.food_source import Plankton
+from agent_store import AgentStore
+from checkpoint import load_checkpoint, save_checkpoint
+from config import SPECIES_PARAMETERS, ModelConfig, load_config
+from datacollection import StreamingDataCollector
+from events import EventLog, EventType
+from forcing import Forcing, seasonal_forcing
+from frame_buffer import FrameBuffer
+from plankton_layer import PlanktonLayer
+from profiling import StepProfiler
+from random_buffer import RandomBuffer
 from scheduler import RandomActivationByTypeFiltered
-import time
+from space import MarineGrid, SparseMarineGrid
+from stopping import StoppingCriteria
+from timers import TimerWheel
 
 
 class MarineEcosystem(mesa.Model):
@@ -15,73 +28,160 @@ class MarineEcosystem(mesa.Model):
     A model of a whole environment in the simulation.
     """
 
+    # phases of a step that are collected with the data, when profiling
+    PROFILED_PHASES = (
+        "timers",
+        "agent_store",
+        "schedule",
+        "JellyfishMedusa.step",
+        "JellyfishPolyp.step",
+        "JellyfishLarva.step",
+        "SeaTurtle.step",
+        "Fish.step",
+        "Plankton.step",
+        "plankton_layer",
+    )
+
     def __init__(self, config_filepath, **kwargs) -> None:
         super().__init__()
+        # seeded from the model's RNG, so runs with the same seed are reproducible
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
+        self.random_buffer = RandomBuffer(self.rng)
 
-        with open(config_filepath) as file:
-            config = json.load(file)
+        # a path of a config file or a parsed ModelConfig
+        config = (
+            config_filepath
+            if isinstance(config_filepath, ModelConfig)
+            else load_config(config_filepath)
+        )
+        self.config = config
+        self.config_filepath = config.path
+        self.parameters = dict(kwargs)
 
-        self.width = config["width"]
-        self.height = config["height"]
+        self.width = config.width
+        self.height = config.height
+        for name in SPECIES_PARAMETERS:
+            setattr(self, name, getattr(config, name))
+        # "agents" - every plankton is an agent, "array" - plankton is a PlanktonLayer
+        self.plankton_engine = kwargs.get("plankton_engine", config.plankton_engine)
 
-        self.jellyfish_larva_time_to_grow = config["jellyfish_larva"]["time_to_grow"]
+        self.max_allowed_temperature = config.max_allowed_temperature  # max value of slider
+        self.min_allowed_temperature = config.min_allowed_temperature  # min value of slider
+        self.max_used_temperature = config.max_used_temperature  # slider
+        self.min_used_temperature = config.min_used_temperature  # slider
 
-        self.jellyfish_polyp_time_to_grow = config["jellyfish_polyp"]["time_to_grow"]
-        self.jellyfish_polyp_gain_from_food = config["jellyfish_polyp"][
-            "gain_from_food"
-        ]
-
-        self.jellyfish_medusa_time_to_grow = config["jellyfish_medusa"]["time_to_grow"]
-        self.jellyfish_medusa_reproduce_probability = config["jellyfish_medusa"][
-            "reproduce_probability"
-        ]
-        self.jellyfish_medusa_reproduce_rate = config["jellyfish_medusa"][
-            "reproduce_rate"
-        ]
-        self.jellyfish_medusa_gain_from_food = config["jellyfish_medusa"][
-            "gain_from_food"
-        ]
-        self.jellyfish_empty_cells_to_reproduce = config["jellyfish_medusa"][
-            "max_non_empty_neighbour_cells_to_reproduce"
-        ]
+        # temperature of every step, seasonal or from a file of a climate scenario
+        temperature_series = kwargs.get("temperature_series", config.temperature_series)
+        if temperature_series is not None:
+            self.forcing = Forcing.from_file(
+                temperature_series,
+                self.min_allowed_temperature,
+                self.max_allowed_temperature,
+            )
+        else:
+            self.forcing = seasonal_forcing(
+                self.min_used_temperature,
+                self.max_used_temperature,
+                self.min_allowed_temperature,
+                self.max_allowed_temperature,
+                period=config.forcing_period,
+            )
+        self.temperature = None
+        self.plankton_growth = None
+        self.plankton_spawn_probability = None
 
-        self.plankton_time_to_grow = config["plankton"]["time_to_grow"]
-        self.plankton_grow_probability = config["plankton"]["grow_probability"]
-        self.plankton_empty_cells_to_reproduce = config["plankton"][
-            "max_non_empty_neighbour_cells_to_reproduce"
-        ]
+        # animals' state in columns, NumPy ones updated at once with `agent_store`
+        self.agent_store = AgentStore(
+            self, vectorized=kwargs.get("agent_store", config.agent_store)
+        )
 
-        self.fish_time_to_grow = config["fish"]["time_to_grow"]
-        self.fish_gain_from_food = config["fish"]["gain_from_food"]
-        self.fish_reproduce_probability = config["fish"]["reproduction_probability"]
+        # growth countdowns fired by timers instead of being decremented every step
+        self.timers = (
+            TimerWheel()
+            if kwargs.get("growth_timers", config.growth_timers)
+            else None
+        )
 
-        self.max_allowed_temperature = config[
-            "max_allowed_temperature"
-        ]  # max value of slider
-        self.min_allowed_temperature = config[
-            "min_allowed_temperature"
-        ]  # min value of slider
+        # polyps and plankton with no space to grow into sleep until a neighbour leaves
+        self.dormancy = kwargs.get("dormancy", config.dormancy)
 
-        self.max_used_temperature = config["max_used_temperature"]  # slider
-        self.min_used_temperature = config["min_used_temperature"]  # slider
-        self.temperature = None
+        self.profiler = StepProfiler(
+            enabled=kwargs.get("profiling", config.profiling),
+            sample_every=config.profiling_sample_every,
+        )
 
         self.schedule = RandomActivationByTypeFiltered(self)
-        self.grid = mesa.space.MultiGrid(self.width, self.height, torus=False)
+        # only cells with agents are kept, for large and mostly empty grids
+        grid_class = (
+            SparseMarineGrid
+            if kwargs.get("sparse_grid", config.sparse_grid)
+            else MarineGrid
+        )
+        self.grid = grid_class(self.width, self.height, torus=False)
+        # prey of predators kept in buckets as wide as the predators see
+        if kwargs.get("spatial_hash", config.spatial_hash):
+            for predator in (SeaTurtle, Fish):
+                self.grid.add_spatial_hash(predator.PREY, predator.SIGHT)
         self.current_step = 0
 
-        self.datacollector = mesa.datacollection.DataCollector(
-            {
-                "Jellyfish Medusae": lambda m: m.schedule.get_type_count(
-                    JellyfishMedusa
-                ),
-                "Jellyfish Polyps": lambda m: m.schedule.get_type_count(JellyfishPolyp),
-                "Jellyfish Larvae": lambda m: m.schedule.get_type_count(JellyfishLarva),
-                "Sea Turtles": lambda m: m.schedule.get_type_count(SeaTurtle),
-                "Fish": lambda m: m.schedule.get_type_count(Fish),
-                "Plankton": lambda m: m.schedule.get_type_count(Plankton),
-            }
+        self.schedule.register_filter("Mature Fish", Fish, lambda fish: fish.is_mature())
+        self.schedule.register_filter(
+            "Female Jellyfish Medusae",
+            JellyfishMedusa,
+            lambda medusa: medusa.sex == JellyfishMedusa.Sex.FEMALE,
         )
+        self.plankton_layer = None
+        if self.plankton_engine == "array":
+            self.plankton_layer = PlanktonLayer(self)
+            self.grid.add_layer(Plankton, self.plankton_layer.density)
+
+        model_reporters = {
+            "Jellyfish Medusae": lambda m: m.schedule.get_type_count(JellyfishMedusa),
+            "Jellyfish Polyps": lambda m: m.schedule.get_type_count(JellyfishPolyp),
+            "Jellyfish Larvae": lambda m: m.schedule.get_type_count(JellyfishLarva),
+            "Sea Turtles": lambda m: m.schedule.get_type_count(SeaTurtle),
+            "Fish": lambda m: m.schedule.get_type_count(Fish),
+            "Plankton": lambda m: m.count_plankton(),
+            "Mature Fish": lambda m: m.schedule.get_filter_count("Mature Fish"),
+            "Female Jellyfish Medusae": lambda m: m.schedule.get_filter_count(
+                "Female Jellyfish Medusae"
+            ),
+        }
+
+        if self.profiler.enabled:
+            for phase in self.PROFILED_PHASES:
+                model_reporters[f"Time {phase} [s]"] = (
+                    lambda m, phase=phase: m.profiler.last_step.get(phase, 0.0)
+                    if m.profiler.active
+                    else math.nan
+                )
+
+        # with a path, data is streamed to a file instead of being kept in memory
+        if kwargs.get("collector_path") is not None:
+            self.datacollector = StreamingDataCollector(
+                model_reporters,
+                kwargs["collector_path"],
+                buffer_size=config.collector_buffer_size,
+                interval=kwargs.get("collector_interval", config.collector_interval),
+                file_format=config.collector_format,
+                append=kwargs.get("collector_append", False),
+            )
+        else:
+            self.datacollector = mesa.datacollection.DataCollector(model_reporters)
+
+        # births, deaths, predation etc. of agents, with a path also written to a file
+        self.events = EventLog(
+            self,
+            capacity=config.events_capacity,
+            sample_every=kwargs.get("events_sample_every", config.events_sample_every),
+            path=kwargs.get("events_path"),
+            file_format=config.events_format,
+            append=kwargs.get("events_append", False),
+        )
+
+        # a compact image of the grid for views, see `enable_frame_buffer`
+        self.frame_buffer = None
+        self.frame_buffer_interval = 1
 
         # for agent in config["initial_population"]:
         #     self._init_population(globals()[agent], config["initial_population"][agent])
@@ -99,20 +199,77 @@ class MarineEcosystem(mesa.Model):
         self._init_population(Fish, kwargs["initial_population_fish"])
         self._init_population(Plankton, kwargs["initial_population_plankton"])
 
+        # conditions that end the run early, and which of them did
+        self.stopping = StoppingCriteria.from_config(
+            config, self.width * self.height, **kwargs
+        )
+        self.stopping.validate(self.datacollector.model_reporters)
+        self.stop_reason = None
         self.running = True
 
     def _init_population(self, agent_type, size):
         """
         Create a new population of agents of a given type.
         """
-        for _ in range(size):
-            x = self.random.randrange(self.width)
-            y = self.random.randrange(self.height)
+        if agent_type is Plankton and self.plankton_layer is not None:
+            self.plankton_layer.spawn(size)
+            return
+
+        self.spawn_many(agent_type, [self.random_position() for _ in range(size)])
+
+    def next_ids(self, count):
+        """
+        Returns a block of `count` new unique ids.
+        """
+        first = self.current_id + 1
+        self.current_id += count
+        return range(first, first + count)
 
-            agent = agent_type(self.next_id(), (x, y), self)
+    def spawn_many(self, agent_class, positions, **attrs):
+        """
+        Creates agents of the class in the given cells, with `attrs` passed to
+        every one of them, and adds them to the grid and the schedule at once.
+        """
+        agents = [
+            agent_class(unique_id, position, self, **attrs)
+            for unique_id, position in zip(self.next_ids(len(positions)), positions)
+        ]
+        self.grid.place_agents(agents, positions)
+        self.schedule.add_many(agents)
+        return agents
 
-            self.grid.place_agent(agent, (x, y))
-            self.schedule.add(agent)
+    def kill_many(self, agents, cause=None):
+        """
+        Removes agents at once, recording their deaths of the cause, or of
+        the usual cause of their class, like `die` does for every one of them.
+        """
+        for agent in agents:
+            self.events.record(
+                EventType.DEATH,
+                agent,
+                cause=agent.DEATH_CAUSE if cause is None else cause,
+            )
+        self.grid.remove_agents(agents)
+        self.schedule.remove_many(agents)
+        for agent in agents:
+            if agent.row is not None:
+                agent.store.release(agent.row)
+                agent.row = None
+
+    def random_position(self):
+        """
+        Returns a random cell of the grid.
+        """
+        return self.random.randrange(self.width), self.random.randrange(self.height)
+
+    def random_positions(self, size):
+        """
+        Returns coordinates of random cells of the grid as two arrays.
+        """
+        return (
+            self.rng.integers(self.width, size=size),
+            self.rng.integers(self.height, size=size),
+        )
 
     def step(self):
         """
@@ -120,32 +277,109 @@ class MarineEcosystem(mesa.Model):
         """
 
         self.current_step += 1
-        self.schedule.step()
-        self.datacollector.collect(self)
+        self.profiler.start_step(self.current_step)
 
-        self.temperature = (
-            float(self.max_used_temperature - self.min_used_temperature) / 2
-        )
-        self.temperature = self.temperature * math.sin(
-            2 * math.pi * self.current_step / 365
-        )
-        self.temperature = (
-            self.temperature
-            + float(self.max_used_temperature + self.min_used_temperature) / 2
+        if self.timers is not None:
+            with self.profiler.phase("timers"):
+                self.timers.fire(self.current_step)
+        if self.agent_store.vectorized:
+            with self.profiler.phase("agent_store"):
+                self.agent_store.step()
+        with self.profiler.phase("schedule"):
+            self.schedule.step()
+        if self.plankton_layer is not None:
+            with self.profiler.phase("plankton_layer"):
+                self.plankton_layer.step()
+        with self.profiler.phase("datacollector"):
+            self.datacollector.collect(self)
+        if self.stopping.enabled:
+            self.check_stopping()
+
+        self.update_temperature()
+
+        with self.profiler.phase("plankton_spawn"):
+            self.spawn_plankton()
+
+        if (
+            self.frame_buffer is not None
+            and self.current_step % self.frame_buffer_interval == 0
+        ):
+            with self.profiler.phase("frame_buffer"):
+                self.frame_buffer.update()
+
+    def check_stopping(self):
+        """
+        Stops the run when one of the stopping criteria is met by the current counts.
+        """
+        reporters = self.datacollector.model_reporters
+        reason = self.stopping.check(
+            self.current_step,
+            {column: reporters[column](self) for column in self.stopping.columns},
         )
+        if reason is not None:
+            self.running = False
+            self.stop_reason = reason
+
+    def update_temperature(self):
+        """
+        Takes the temperature of the current step and rates that depend on it
+        from the forcing.
+        """
+        (
+            self.temperature,
+            self.plankton_growth,
+            self.plankton_spawn_probability,
+        ) = self.forcing.at(self.current_step)
 
-        for _ in range(5):
+    def enable_frame_buffer(self, shared=False, interval=1):
+        """
+        Makes the model draw itself into a FrameBuffer every `interval` steps,
+        optionally in shared memory for views running in other processes.
+        """
+        if self.frame_buffer is None:
+            self.frame_buffer = FrameBuffer(self, shared=shared)
+        self.frame_buffer_interval = interval
+        self.frame_buffer.update()
+        return self.frame_buffer
+
+    def spawn_plankton(self, attempts=5):
+        """
+        Places new plankton in random cells, when the temperature allows it.
+        """
+        if self.plankton_layer is not None:
             if self.plankton_reproduction_probability() > 0.0:
-                x = self.random.randrange(self.width)
-                y = self.random.randrange(self.height)
-                plankton = Plankton(self.next_id(), (x, y), self)
-                self.grid.place_agent(plankton, (x, y))
-                self.schedule.add(plankton)
+                self.plankton_layer.spawn(attempts)
+        elif self.plankton_reproduction_probability() > 0.0:
+            plankton = self.spawn_many(
+                Plankton, [self.random_position() for _ in range(attempts)]
+            )
+            for agent in plankton:
+                self.events.record(EventType.BIRTH, agent)
+
+    def profile_report(self):
+        """
+        Returns a table of time spent in phases of steps, see `StepProfiler`.
+        """
+        return self.profiler.report()
+
+    def save_checkpoint(self, path):
+        """
+        Saves the whole state of the model, see `checkpoint` for the format.
+        """
+        save_checkpoint(self, path)
+
+    @classmethod
+    def from_checkpoint(cls, path, **overrides):
+        """
+        Creates a model that continues from the checkpoint, with optionally
+        changed parameters.
+        """
+        return load_checkpoint(cls, path, **overrides)
 
     def plankton_reproduction_probability(self):
-        return math.sin(
-            math.pi
-            / 2
-            * self.temperature
-            / (self.max_allowed_temperature - self.min_allowed_temperature)
-        )
+        return self.plankton_spawn_probability
+
+    def count_plankton(self):
+        if self.plankton_layer is not None:
+            return self.plankton_layer.count()
+        return self.schedule.get_type_count(Plankton)
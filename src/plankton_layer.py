@@ -0,0 +1,120 @@
+import mesa
+import numpy as np
+
+from custom_types import Position
+
+
+# Moore neighbourhood of radius 1 without the center
+NEIGHBOUR_OFFSETS = np.array(
+    [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+)
+
+
+class PlanktonLayer:
+    """
+    Plankton of the whole grid kept as dense `width x height` arrays instead of agents.
+
+    A cell holds at most one plankton. Its density is 0 where there is no plankton.
+    The whole layer is updated with array operations once per step, which mirrors
+    `Plankton.step` and `Plankton.grow` for every plankton at once.
+    """
+
+    def __init__(self, model: mesa.Model) -> None:
+        self.model = model
+        self.width = model.width
+        self.height = model.height
+
+        self.density = np.zeros((self.width, self.height))
+        self.time_to_grow = np.zeros((self.width, self.height), dtype=np.int32)
+
+        self.rng = model.rng
+
+    def count(self) -> int:
+        return int(np.count_nonzero(self.density))
+
+    def add(self, xs, ys, density=0.5) -> None:
+        """
+        Places new plankton in the given cells, cells with plankton are left as they are.
+        """
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        new = self.density[xs, ys] == 0
+        xs, ys = xs[new], ys[new]
+        self.density[xs, ys] = density
+        self.time_to_grow[xs, ys] = self.model.plankton_time_to_grow
+
+    def spawn(self, size: int) -> None:
+        """
+        Places plankton in random cells of the grid.
+        """
+        self.add(*self.model.random_positions(size))
+
+    def eat(self, position: Position) -> float:
+        """
+        Removes plankton from the cell and returns its density.
+        """
+        density = self.density[position]
+        self.density[position] = 0
+        return density
+
+    def step(self) -> None:
+        """
+        Counts down to growing for every plankton and lets the grown ones spread
+        to a random neighbour cell, with a probability depending on the temperature.
+        """
+        present = self.density > 0
+        self.time_to_grow[present] -= 1
+
+        growing = present & (self.time_to_grow <= 0)
+        if self.model.temperature is None or not growing.any():
+            return
+
+        occupied = present | self.model.grid.occupied_mask()
+        growing &= (
+            self._count_occupied_neighbours(occupied)
+            <= self.model.plankton_empty_cells_to_reproduce
+        )
+
+        xs, ys = np.nonzero(growing)
+        new_xs, new_ys = self._random_neighbours(xs, ys)
+
+        new = ~occupied[new_xs, new_ys] & (
+            self.rng.random(len(xs)) < self.model.plankton_growth
+        )
+        self.add(new_xs[new], new_ys[new])
+
+    def _count_occupied_neighbours(self, occupied: np.ndarray) -> np.ndarray:
+        """
+        Convolves the occupancy mask with the Moore neighbourhood of radius 1.
+        """
+        padded = np.pad(occupied.astype(np.int8), 1)
+        counts = np.zeros((self.width, self.height), dtype=np.int8)
+        for dx, dy in NEIGHBOUR_OFFSETS:
+            counts += padded[
+                1 + dx : 1 + dx + self.width, 1 + dy : 1 + dy + self.height
+            ]
+        return counts
+
+    def _random_neighbours(self, xs: np.ndarray, ys: np.ndarray):
+        """
+        Draws a random neighbour cell inside the grid for every given cell.
+        """
+        new_xs = np.empty_like(xs)
+        new_ys = np.empty_like(ys)
+        pending = np.arange(len(xs))
+        while len(pending):
+            offsets = NEIGHBOUR_OFFSETS[
+                self.rng.integers(len(NEIGHBOUR_OFFSETS), size=len(pending))
+            ]
+            candidate_xs = xs[pending] + offsets[:, 0]
+            candidate_ys = ys[pending] + offsets[:, 1]
+            inside = (
+                (candidate_xs >= 0)
+                & (candidate_xs < self.width)
+                & (candidate_ys >= 0)
+                & (candidate_ys < self.height)
+            )
+            new_xs[pending[inside]] = candidate_xs[inside]
+            new_ys[pending[inside]] = candidate_ys[inside]
+            pending = pending[~inside]
+        return new_xs, new_ys
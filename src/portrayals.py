@@ -11,6 +11,17 @@ from agents.animals import (
 )
 
 
+# population counts drawn in the chart
+CHART_SERIES = [
+    {"Label": "Jellyfish Medusae", "Color": "#F999B7"},
+    {"Label": "Jellyfish Larvae", "Color": "#F9C5D5"},
+    {"Label": "Jellyfish Polyps", "Color": "#F2789F"},
+    {"Label": "Sea Turtles", "Color": "#EE8A24"},
+    {"Label": "Fish", "Color": "#63AFE6"},
+    {"Label": "Plankton", "Color": "yellowgreen"},
+]
+
+
 def agent_portrayal(agent):
     match agent:
         case JellyfishLarva():
@@ -26,7 +37,7 @@ def agent_portrayal(agent):
             # https://icons8.com/icon/JrrHSGz7NmRU/coral
             portrayal = {
                 "Shape": "resources/polyp1.png"
-                if polyp.random.random() < 0.5
+                if polyp.sprite == 0
                 else "resources/polyp2.png",
                 "scale": 2.5,
                 "Layer": 1,
@@ -36,7 +47,7 @@ def agent_portrayal(agent):
             # https://icons8.com/icon/NU0xLnU5q3q8/jellyfish
             portrayal = {
                 "Shape": "resources/jelly1.png"
-                if medusa.random.random() < 0.5
+                if medusa.sprite == 0
                 else "resources/jelly2.png",
                 "scale": 3,
                 "Layer": 1,
@@ -54,7 +65,7 @@ def agent_portrayal(agent):
             # https://icons8.com/icon/GZZxLoYInRiK/turtle
             portrayal = {
                 "Shape": "resources/turtle1.png"
-                if turtle.random.random() < 0.5
+                if turtle.sprite == 0
                 else "resources/turtle2.png",
                 "scale": 7,
                 "Layer": 5,
@@ -64,7 +75,7 @@ def agent_portrayal(agent):
             # https://icons8.com/icon/u6IuaW242HuR/fish
             portrayal = {
                 "Shape": "resources/fish1.png"
-                if fish.random.random() < 0.5
+                if fish.sprite == 0
                 else "resources/fish2.png",
                 "scale": 3 if fish.is_mature() else 1,
                 "Layer": 4,
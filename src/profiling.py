@@ -0,0 +1,98 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter
+
+
+class StepProfiler:
+    """
+    Wall time and number of calls of phases of model steps.
+
+    Only every `sample_every`-th step is measured, the rest cost a single check
+    per instrumented call. Times of nested phases include each other, e.g. time
+    of "Fish.step" includes time of "Fish.random_move".
+
+    Example:
+    >>> profiler = StepProfiler(sample_every=10)
+    >>> profiler.start_step(step)
+    >>> with profiler.phase("schedule"):
+    ...     schedule.step()
+    >>> print(profiler.report())
+    """
+
+    def __init__(self, enabled: bool = True, sample_every: int = 1) -> None:
+        self.enabled = enabled
+        self.sample_every = sample_every
+        self.active = False
+
+        self.times: defaultdict[str, float] = defaultdict(float)
+        self.calls: defaultdict[str, int] = defaultdict(int)
+        self.last_step: dict[str, float] = {}
+        self.sampled_steps = 0
+
+    def start_step(self, step: int) -> None:
+        self.active = self.enabled and step % self.sample_every == 0
+        if self.active:
+            self.sampled_steps += 1
+            self.last_step = {}
+
+    def record(self, name: str, elapsed: float, calls: int = 1) -> None:
+        self.times[name] += elapsed
+        self.calls[name] += calls
+        self.last_step[name] = self.last_step.get(name, 0.0) + elapsed
+
+    def phase(self, name: str):
+        """
+        Returns a context manager measuring the time of its block.
+        """
+        if not self.active:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    def report(self) -> str:
+        """
+        Returns a table of all the phases, the slowest first.
+        """
+        steps = max(self.sampled_steps, 1)
+        lines = [
+            f"Profiled {self.sampled_steps} steps",
+            f"{'phase':<32}{'calls':>12}{'total [s]':>12}{'per step [ms]':>16}{'per call [us]':>16}",
+        ]
+        for name, total in sorted(self.times.items(), key=lambda item: -item[1]):
+            calls = self.calls[name]
+            lines.append(
+                f"{name:<32}{calls:>12}{total:>12.3f}"
+                f"{1e3 * total / steps:>16.3f}{1e6 * total / calls:>16.2f}"
+            )
+        return "\n".join(lines)
+
+
+def profiled(method):
+    """
+    Measures calls of an agent's method with the model's profiler,
+    as "<agent class>.<method name>".
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.model.profiler
+        if not profiler.active:
+            return method(self, *args, **kwargs)
+
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.record(
+                f"{type(self).__name__}.{method.__name__}", perf_counter() - start
+            )
+
+    return wrapper
@@ -0,0 +1,59 @@
+from bisect import bisect
+from typing import Sequence
+
+import numpy as np
+
+
+class RandomBuffer:
+    """
+    Random numbers drawn from a NumPy generator in blocks.
+
+    Agents take single numbers one at a time, which costs a lot when each of them
+    is a separate call to a generator. The buffer draws a whole block of numbers
+    with one call and hands them out until the block runs out.
+
+    Example:
+    >>> buffer = RandomBuffer(np.random.default_rng(42))
+    >>> buffer.random()
+    >>> buffer.choice(["a", "b", "c"])
+    """
+
+    def __init__(self, rng: np.random.Generator, block_size: int = 4096) -> None:
+        self.rng = rng
+        self.block_size = block_size
+        self._uniforms: list[float] = []
+        self._normals: list[float] = []
+
+    def random(self) -> float:
+        """
+        Returns a random float from [0, 1).
+        """
+        if not self._uniforms:
+            self._uniforms = self.rng.random(self.block_size).tolist()
+        return self._uniforms.pop()
+
+    def normal(self, mean: float = 0.0, std: float = 1.0) -> float:
+        """
+        Returns a random float from the normal distribution.
+        """
+        if not self._normals:
+            self._normals = self.rng.standard_normal(self.block_size).tolist()
+        return mean + std * self._normals.pop()
+
+    def randrange(self, stop: int) -> int:
+        """
+        Returns a random integer from [0, stop).
+        """
+        return int(self.random() * stop)
+
+    def choice(self, sequence: Sequence):
+        """
+        Returns a random element of a non-empty sequence.
+        """
+        return sequence[int(self.random() * len(sequence))]
+
+    def weighted_choice(self, sequence: Sequence, cum_weights: Sequence[float]):
+        """
+        Returns a random element of a sequence with given cumulative weights.
+        """
+        return sequence[bisect(cum_weights, self.random() * cum_weights[-1])]
@@ -0,0 +1,96 @@
+// Draws frames of `frame_buffer.FrameBuffer`: one byte per cell, rows from the top.
+const FrameCanvasModule = function (canvas_width, canvas_height, grid_width, grid_height) {
+  const PLANKTON_BIT = 0b1;
+  const SPECIES_MASK = 0b1110;
+  const SPECIES_SHIFT = 1;
+  const SPRITE_BIT = 0b10000;
+  const LARGE_BIT = 0b100000;
+
+  const parent = document.createElement("div");
+  parent.style.height = `${canvas_height}px`;
+  parent.className = "world-grid-parent";
+
+  const canvas = document.createElement("canvas");
+  canvas.width = canvas_width;
+  canvas.height = canvas_height;
+  canvas.className = "world-grid";
+  parent.appendChild(canvas);
+  document.getElementById("elements").appendChild(parent);
+
+  const context = canvas.getContext("2d");
+  const cellWidth = canvas_width / grid_width;
+  const cellHeight = canvas_height / grid_height;
+
+  const image = (name) => {
+    const img = new Image();
+    img.src = `local/custom/resources/${name}`;
+    return img;
+  };
+
+  // species codes of `frame_buffer.SPECIES_CODES`, drawn in this order
+  const SPECIES = {
+    1: { color: "#f76fa3", r: 0.3 },
+    2: { images: [image("polyp1.png"), image("polyp2.png")], scale: 2.5 },
+    3: { images: [image("jelly1.png"), image("jelly2.png")], scale: 3 },
+    4: { images: [image("fish1.png"), image("fish2.png")], scale: 1, largeScale: 3 },
+    5: { images: [image("turtle1.png"), image("turtle2.png")], scale: 7 },
+  };
+
+  const drawCircle = (x, y, r, color) => {
+    context.beginPath();
+    context.arc(
+      (x + 0.5) * cellWidth,
+      (y + 0.5) * cellHeight,
+      (r * Math.min(cellWidth, cellHeight)) / 2,
+      0,
+      2 * Math.PI
+    );
+    context.fillStyle = color;
+    context.fill();
+  };
+
+  const drawImage = (img, x, y, scale) => {
+    const width = cellWidth * scale;
+    const height = cellHeight * scale;
+    context.drawImage(
+      img,
+      (x + 0.5) * cellWidth - width / 2,
+      (y + 0.5) * cellHeight - height / 2,
+      width,
+      height
+    );
+  };
+
+  this.render = (data) => {
+    const binary = atob(data.codes);
+    const cells = {};
+    for (const species in SPECIES) cells[species] = [];
+
+    context.clearRect(0, 0, canvas_width, canvas_height);
+    for (let index = 0; index < binary.length; index++) {
+      const code = binary.charCodeAt(index);
+      if (code === 0) continue;
+      const x = index % grid_width;
+      const y = Math.floor(index / grid_width);
+      if (code & PLANKTON_BIT) drawCircle(x, y, 0.5, "green");
+      const species = (code & SPECIES_MASK) >> SPECIES_SHIFT;
+      if (species) cells[species].push([x, y, code]);
+    }
+
+    for (const species in SPECIES) {
+      const style = SPECIES[species];
+      for (const [x, y, code] of cells[species]) {
+        if (style.images === undefined) {
+          drawCircle(x, y, style.r, style.color);
+        } else {
+          const scale = code & LARGE_BIT ? style.largeScale : style.scale;
+          drawImage(style.images[code & SPRITE_BIT ? 1 : 0], x, y, scale);
+        }
+      }
+    }
+  };
+
+  this.reset = () => {
+    context.clearRect(0, 0, canvas_width, canvas_height);
+  };
+};
@@ -1,4 +1,6 @@
-from typing import Callable, Optional, Type
+from collections import defaultdict
+from time import perf_counter
+from typing import Callable, Optional, Sequence, Type
 
 import mesa
 
@@ -8,11 +10,152 @@ class RandomActivationByTypeFiltered(mesa.time.RandomActivationByType):
     A scheduler that overrides the get_type_count method to allow for filtering
     of agents by a function before counting.
 
+    Counts of agents of every type are kept up to date when agents are added
+    and removed. Filters registered under a name are counted the same way,
+    so counting them doesn't need a pass over all the agents.
+
+    Agents added with `asleep` set, or put to sleep with `sleep`, aren't stepped
+    until they are woken with `wake`, e.g. by a TimerWheel or by the grid,
+    but are counted like the others.
+
     Example:
     >>> scheduler = RandomActivationByTypeFiltered(model)
     >>> scheduler.get_type_count(AgentA, lambda agent: agent.some_attribute > 10)
+    >>> scheduler.register_filter("big A", AgentA, lambda agent: agent.some_attribute > 10)
+    >>> scheduler.get_filter_count("big A")
     """
 
+    def __init__(self, model: mesa.Model) -> None:
+        super().__init__(model)
+        self.type_counts: defaultdict[Type[mesa.Agent], int] = defaultdict(int)
+        # agents that are stepped, a subset of `agents_by_type` in the order they were woken
+        self.awake_by_type: defaultdict[Type[mesa.Agent], dict[int, mesa.Agent]] = (
+            defaultdict(dict)
+        )
+
+        self._filters: dict[str, tuple[Type[mesa.Agent], Callable]] = {}
+        self._filters_by_type: defaultdict[Type[mesa.Agent], list[str]] = defaultdict(
+            list
+        )
+        self._filter_members: dict[str, set[int]] = {}
+
+    def add(self, agent: mesa.Agent) -> None:
+        super().add(agent)
+        self.type_counts[type(agent)] += 1
+        if not getattr(agent, "asleep", False):
+            self.awake_by_type[type(agent)][agent.unique_id] = agent
+        for name in self._filters_by_type.get(type(agent), ()):
+            if self._filters[name][1](agent):
+                self._filter_members[name].add(agent.unique_id)
+
+    def remove(self, agent: mesa.Agent) -> None:
+        super().remove(agent)
+        self.type_counts[type(agent)] -= 1
+        self.awake_by_type[type(agent)].pop(agent.unique_id, None)
+        for name in self._filters_by_type.get(type(agent), ()):
+            self._filter_members[name].discard(agent.unique_id)
+
+    def sleep(self, agent: mesa.Agent) -> None:
+        """
+        Stops stepping the agent until it's woken with `wake`.
+        """
+        agent.asleep = True
+        self.awake_by_type[type(agent)].pop(agent.unique_id, None)
+
+    def wake(self, agent: mesa.Agent) -> None:
+        """
+        Makes the scheduler step the sleeping agent from now on.
+        """
+        if agent.asleep and agent.unique_id in self._agents:
+            agent.asleep = False
+            self.awake_by_type[type(agent)][agent.unique_id] = agent
+
+    def set_awake(self, type_class: Type[mesa.Agent], unique_ids: list[int]) -> None:
+        """
+        Makes the given agents of the type, in the given order, the only ones
+        that are stepped, e.g. when restoring a checkpoint.
+        """
+        agents = self.agents_by_type[type_class]
+        for agent in agents.values():
+            agent.asleep = True
+        self.awake_by_type[type_class] = {}
+        for unique_id in unique_ids:
+            agents[unique_id].asleep = False
+            self.awake_by_type[type_class][unique_id] = agents[unique_id]
+
+    def add_many(self, agents: Sequence[mesa.Agent]) -> None:
+        """
+        Adds agents at once, like `add` does for every one of them.
+        """
+        for agent_type, group in self._by_type(agents).items():
+            ids = [agent.unique_id for agent in group]
+            if not self._agents.keys().isdisjoint(ids):
+                raise ValueError(f"Some of agents {ids} are already added to the scheduler")
+
+            self._agents.update(zip(ids, group))
+            self.agents_by_type[agent_type].update(zip(ids, group))
+            self.type_counts[agent_type] += len(group)
+            self.awake_by_type[agent_type].update(
+                (agent.unique_id, agent)
+                for agent in group
+                if not getattr(agent, "asleep", False)
+            )
+            for name in self._filters_by_type.get(agent_type, ()):
+                filter_func = self._filters[name][1]
+                self._filter_members[name].update(
+                    agent.unique_id for agent in group if filter_func(agent)
+                )
+
+    def remove_many(self, agents: Sequence[mesa.Agent]) -> None:
+        """
+        Removes agents at once, like `remove` does for every one of them.
+        """
+        for agent_type, group in self._by_type(agents).items():
+            agents_of_type = self.agents_by_type[agent_type]
+            awake = self.awake_by_type[agent_type]
+            for agent in group:
+                del self._agents[agent.unique_id]
+                del agents_of_type[agent.unique_id]
+                awake.pop(agent.unique_id, None)
+            self.type_counts[agent_type] -= len(group)
+            for name in self._filters_by_type.get(agent_type, ()):
+                self._filter_members[name].difference_update(
+                    agent.unique_id for agent in group
+                )
+
+    @staticmethod
+    def _by_type(
+        agents: Sequence[mesa.Agent],
+    ) -> dict[Type[mesa.Agent], list[mesa.Agent]]:
+        groups: dict[Type[mesa.Agent], list[mesa.Agent]] = {}
+        for agent in agents:
+            groups.setdefault(type(agent), []).append(agent)
+        return groups
+
+    def step_type(self, type_class: Type[mesa.Agent], shuffle_agents: bool = True) -> None:
+        """
+        Runs all awake agents of the type, measuring it with the model's
+        profiler as "<agent class>.step" when profiling.
+        """
+        profiler = getattr(self.model, "profiler", None)
+        if profiler is None or not profiler.active:
+            self._step_awake(type_class, shuffle_agents)
+            return
+
+        calls = len(self.awake_by_type[type_class])
+        start = perf_counter()
+        self._step_awake(type_class, shuffle_agents)
+        profiler.record(f"{type_class.__name__}.step", perf_counter() - start, calls)
+
+    def _step_awake(self, type_class: Type[mesa.Agent], shuffle_agents: bool) -> None:
+        awake = self.awake_by_type[type_class]
+        agent_keys = list(awake)
+        if shuffle_agents:
+            self.model.random.shuffle(agent_keys)
+        for agent_key in agent_keys:
+            if agent_key in awake:
+                awake[agent_key].step()
+
     def get_type_count(
         self,
         type_class: Type[mesa.Agent],
@@ -22,8 +165,50 @@ class RandomActivationByTypeFiltered(mesa.time.RandomActivationByType):
         Returns the current number of agents of certain type in the queue
         that satisfy the filter function.
         """
+        if filter_func is None:
+            return self.type_counts.get(type_class, 0)
+
         count = 0
         for agent in self.agents_by_type[type_class].values():
-            if filter_func is None or filter_func(agent):
+            if filter_func(agent):
                 count += 1
         return count
+
+    def register_filter(
+        self,
+        name: str,
+        type_class: Type[mesa.Agent],
+        filter_func: Callable[[mesa.Agent], bool],
+    ) -> None:
+        """
+        Registers a filter whose count is kept up to date.
+
+        If the result of the filter depends on a changing state of an agent,
+        the agent has to call `update_agent` after changing it.
+        """
+        if name in self._filters:
+            raise ValueError(f"Filter {name!r} is already registered")
+
+        self._filters[name] = (type_class, filter_func)
+        self._filters_by_type[type_class].append(name)
+        self._filter_members[name] = {
+            unique_id
+            for unique_id, agent in self.agents_by_type[type_class].items()
+            if filter_func(agent)
+        }
+
+    def get_filter_count(self, name: str) -> int:
+        """
+        Returns the current number of agents that satisfy the registered filter.
+        """
+        return len(self._filter_members[name])
+
+    def update_agent(self, agent: mesa.Agent) -> None:
+        """
+        Evaluates registered filters of the agent's type again for this agent.
+        """
+        for name in self._filters_by_type.get(type(agent), ()):
+            if self._filters[name][1](agent):
+                self._filter_members[name].add(agent.unique_id)
+            else:
+                self._filter_members[name].discard(agent.unique_id)
@@ -1,7 +1,8 @@
 import json
 import mesa
-from portrayals import agent_portrayal
+from frame_canvas import FrameCanvas
 from model import MarineEcosystem
+from portrayals import CHART_SERIES
 
 
 CONFIGS_DIR = "configs"
@@ -11,24 +12,14 @@ CONFIG_FILE_PATH = f"{CONFIGS_DIR}/{CONFIG_FILE}"
 with open(CONFIG_FILE_PATH) as file:
     config = json.load(file)
 
-grid = mesa.visualization.CanvasGrid(
-    agent_portrayal,
+grid = FrameCanvas(
     config["width"],
     config["height"],
     canvas_width=config["width"] * 8,
     canvas_height=config["height"] * 8,
 )
 
-chart = mesa.visualization.ChartModule(
-    [
-        {"Label": "Jellyfish Medusae", "Color": "#F999B7"},
-        {"Label": "Jellyfish Larvae", "Color": "#F9C5D5"},
-        {"Label": "Jellyfish Polyps", "Color": "#F2789F"},
-        {"Label": "Sea Turtles", "Color": "#EE8A24"},
-        {"Label": "Fish", "Color": "#63AFE6"},
-        {"Label": "Plankton", "Color": "yellowgreen"},
-    ]
-)
+chart = mesa.visualization.ChartModule(CHART_SERIES)
 
 model_params = {
     "title": mesa.visualization.StaticText("Parameters:"),
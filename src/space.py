@@ -0,0 +1,834 @@
+import itertools
+from functools import lru_cache, partial
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Type
+
+import mesa
+import numpy as np
+
+from custom_types import Position
+
+
+# Number of neighborhoods kept by the per-cell cache of a grid
+NEIGHBORHOOD_CACHE_SIZE = 4096
+
+# Fewer agents placed or removed at once have their counts updated one by one
+BULK_UPDATE_MIN = 64
+
+
+@lru_cache(maxsize=None)
+def neighborhood_offsets(
+    radius: int, moore: bool, include_center: bool
+) -> tuple[Position, ...]:
+    """
+    Returns offsets of cells in the neighborhood of radius around (0, 0),
+    in the order in which `mesa.space.MultiGrid.get_neighborhood` visits them.
+
+    Offsets are shared by all the grids in the process.
+    """
+    return tuple(
+        (dx, dy)
+        for dx in range(-radius, radius + 1)
+        for dy in range(-radius, radius + 1)
+        if (moore or abs(dx) + abs(dy) <= radius)
+        and (include_center or (dx, dy) != (0, 0))
+    )
+
+
+def build_neighborhood(
+    width: int,
+    height: int,
+    torus: bool,
+    pos: Position,
+    moore: bool,
+    include_center: bool,
+    radius: int,
+) -> tuple[Position, ...]:
+    """
+    Returns cells of the neighborhood of radius around the cell of a grid,
+    in the order in which `mesa.space.MultiGrid.get_neighborhood` returns them.
+    """
+    x, y = pos
+    if not (0 <= x < width and 0 <= y < height):
+        raise Exception("The `pos` tuple passed is out of bounds.")
+
+    offsets = neighborhood_offsets(radius, moore, include_center)
+
+    if x >= radius and width - x > radius and y >= radius and height - y > radius:
+        return tuple((x + dx, y + dy) for dx, dy in offsets)
+
+    if not torus:
+        return tuple(
+            (x + dx, y + dy)
+            for dx, dy in offsets
+            if 0 <= x + dx < width and 0 <= y + dy < height
+        )
+
+    # a dict keeps the insertion order of cells reached more than once
+    neighborhood = {((x + dx) % width, (y + dy) % height): True for dx, dy in offsets}
+    if not include_center:
+        neighborhood.pop(pos, None)
+    return tuple(neighborhood)
+
+
+@lru_cache(maxsize=None)
+def shared_neighborhoods(width: int, height: int, torus: bool, cache_size: int):
+    """
+    Returns the neighborhood cache of grids of the shape, shared by all
+    of them in the process, e.g. by replicas of an ensemble.
+    """
+    return lru_cache(maxsize=cache_size)(partial(build_neighborhood, width, height, torus))
+
+
+class SpatialHash:
+    """
+    Cells that contain agents of a type, in square buckets of `bucket_size`
+    cells, for range queries that cost as much as there are such cells
+    nearby instead of as much as the area of the range.
+
+    With buckets as wide as the range (2 * radius + 1), a range touches
+    at most 4 of them.
+
+    Example:
+    >>> index = SpatialHash(bucket_size=11)
+    >>> index.add((10, 20))
+    >>> index.cells_within((12, 18), radius=5)
+    [(10, 20)]
+    """
+
+    def __init__(self, bucket_size: int) -> None:
+        self.bucket_size = bucket_size
+        self._buckets: dict[Position, set[Position]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def add(self, pos: Position) -> None:
+        key = (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = {pos}
+        else:
+            bucket.add(pos)
+
+    def discard(self, pos: Position) -> None:
+        key = (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.discard(pos)
+            if not bucket:
+                del self._buckets[key]
+
+    def cells_within(
+        self, pos: Position, radius: int, include_center: bool = False
+    ) -> list[Position]:
+        """
+        Returns the cells in the Moore neighborhood of radius around the cell,
+        in the order `get_neighborhood` returns them.
+        """
+        x, y = pos
+        size = self.bucket_size
+        buckets = self._buckets
+        cells = []
+        for bucket_x in range((x - radius) // size, (x + radius) // size + 1):
+            for bucket_y in range((y - radius) // size, (y + radius) // size + 1):
+                bucket = buckets.get((bucket_x, bucket_y))
+                if bucket:
+                    cells.extend(
+                        cell
+                        for cell in bucket
+                        if abs(cell[0] - x) <= radius and abs(cell[1] - y) <= radius
+                    )
+        if not include_center and pos in cells:
+            cells.remove(pos)
+        cells.sort()
+        return cells
+
+
+class MarineGrid(mesa.space.MultiGrid):
+    """
+    A MultiGrid that keeps counts of agents of every type in every cell.
+
+    Counts are NumPy arrays indexed by [x, y], so questions like "is this cell
+    free of anything but food" don't need to look at the agents in the cell.
+    They also back typed neighbour queries, which only look into cells that
+    contain agents of the wanted type.
+
+    Layers are arrays of a type that isn't kept as agents (e.g. `PlanktonLayer`),
+    they are searched by `cells_containing` like occupancy counts are.
+
+    Neighborhoods are built from precomputed offsets clipped at the borders.
+    Instead of Mesa's cache, which grows with every cell ever asked for,
+    only the most recently used neighborhoods are cached, in one cache for
+    all grids of the same shape.
+
+    Sleeping agents that can't act until there is space next to them are
+    woken when an agent leaves a cell of their Moore neighborhood, see
+    `wake_when_vacated`.
+
+    Cells with agents of a type searched over wide ranges, like prey of
+    predators, can also be kept in a SpatialHash, see `add_spatial_hash`.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        torus: bool,
+        neighborhood_cache_size: int = NEIGHBORHOOD_CACHE_SIZE,
+    ) -> None:
+        super().__init__(width, height, torus)
+        self._init_indexes(neighborhood_cache_size)
+        self.occupancy: dict[Type[mesa.Agent], np.ndarray] = {}
+        self.agents_count = np.zeros((self.width, self.height), dtype=np.int32)
+        self.non_food_count = np.zeros((self.width, self.height), dtype=np.int32)
+
+    def _init_indexes(self, neighborhood_cache_size: int) -> None:
+        self._cached_neighborhood = shared_neighborhoods(
+            self.width, self.height, self.torus, neighborhood_cache_size
+        )
+        self.layers: dict[Type[mesa.Agent], np.ndarray] = {}
+        self.spatial_hashes: dict[Type[mesa.Agent], SpatialHash] = {}
+        # agents waiting for a cell next to them to be vacated, by their cells
+        self._dormant: dict[Position, list[mesa.Agent]] = {}
+
+    def add_layer(self, type_class: Type[mesa.Agent], values: np.ndarray) -> None:
+        """
+        Registers an array whose cells with positive values contain the type.
+        """
+        self.layers[type_class] = values
+
+    def add_spatial_hash(self, type_class: Type[mesa.Agent], radius: int) -> None:
+        """
+        Keeps cells with agents of exactly the type in a SpatialHash with
+        buckets matched to the radius, which then answers Moore range queries
+        of `cells_containing` and `get_neighbors_of_type` for the type.
+        """
+        if type_class in self.spatial_hashes:
+            return
+        index = SpatialHash(2 * radius + 1)
+        for pos in zip(*(axis.tolist() for axis in np.nonzero(self.type_mask(type_class)))):
+            index.add(pos)
+        self.spatial_hashes[type_class] = index
+
+    def occupied_mask(self) -> np.ndarray:
+        """
+        Returns a [x, y] array, True in the cells that contain any agent.
+        """
+        return self.agents_count > 0
+
+    def type_mask(self, type_class: Type[mesa.Agent]) -> np.ndarray:
+        """
+        Returns a [x, y] array, True in the cells that contain agents of exactly the type.
+        """
+        occupancy = self.occupancy.get(type_class)
+        if occupancy is None:
+            return np.zeros((self.width, self.height), dtype=bool)
+        return occupancy > 0
+
+    def get_neighborhood(
+        self,
+        pos: Position,
+        moore: bool,
+        include_center: bool = False,
+        radius: int = 1,
+    ) -> Sequence[Position]:
+        return self._cached_neighborhood(pos, moore, include_center, radius)
+
+    def place_agent(self, agent: mesa.Agent, pos: Position) -> None:
+        x, y = pos
+        if agent.pos is None or agent not in self._grid[x][y]:
+            super().place_agent(agent, pos)
+            self._update_counts(agent, pos, 1)
+
+    def remove_agent(self, agent: mesa.Agent) -> None:
+        pos = agent.pos
+        super().remove_agent(agent)
+        self._update_counts(agent, pos, -1)
+        if self._dormant:
+            self._vacated(agent, pos)
+
+    def place_agents(
+        self, agents: Sequence[mesa.Agent], positions: Sequence[Position]
+    ) -> None:
+        """
+        Places new agents, not yet on the grid, in the given cells, like
+        `place_agent` does for every one of them.
+        """
+        if len(agents) < BULK_UPDATE_MIN:
+            for agent, pos in zip(agents, positions):
+                self.place_agent(agent, pos)
+            return
+
+        grid = self._grid
+        for agent, pos in zip(agents, positions):
+            grid[pos[0]][pos[1]].append(agent)
+            agent.pos = pos
+        if self._empties_built:
+            self._empties.difference_update(positions)
+        self._update_counts_many(agents, positions, 1)
+
+    def remove_agents(self, agents: Sequence[mesa.Agent]) -> None:
+        """
+        Removes agents from the grid, like `remove_agent` does for every one of them.
+        """
+        if len(agents) < BULK_UPDATE_MIN:
+            for agent in agents:
+                self.remove_agent(agent)
+            return
+
+        positions = [agent.pos for agent in agents]
+        grid = self._grid
+        for agent, (x, y) in zip(agents, positions):
+            grid[x][y].remove(agent)
+            agent.pos = None
+        if self._empties_built:
+            self._empties.update(pos for pos in positions if self.is_cell_empty(pos))
+        self._update_counts_many(agents, positions, -1)
+        if self._dormant:
+            for agent, pos in zip(agents, positions):
+                self._vacated(agent, pos)
+
+    def wake_when_vacated(self, agent: mesa.Agent) -> None:
+        """
+        Calls the agent's `wake` when a cell next to it becomes empty or, for
+        agents with `WAITS_FOR_NON_FOOD` set, free of agents that aren't food.
+        """
+        self._dormant.setdefault(agent.pos, []).append(agent)
+
+    def stop_waiting(self, agent: mesa.Agent, pos: Optional[Position] = None) -> None:
+        """
+        Forgets the agent waiting in its cell, or in `pos` when it has left it,
+        e.g. when it was woken by something else.
+        """
+        pos = agent.pos if pos is None else pos
+        dormant = self._dormant.get(pos)
+        if dormant and agent in dormant:
+            dormant.remove(agent)
+            if not dormant:
+                del self._dormant[pos]
+
+    def wake_rows(self, rows: Sequence[int]) -> None:
+        """
+        Wakes agents waiting in the rows, e.g. when counts of cells next to
+        them were changed without agents leaving.
+        """
+        if not self._dormant:
+            return
+        for y in rows:
+            for x in range(self.width):
+                self._wake_cell((x, y))
+
+    def get_dormant(self) -> list[mesa.Agent]:
+        """
+        Returns agents waiting for a cell next to them to be vacated.
+        """
+        return [agent for agents in self._dormant.values() for agent in agents]
+
+    def _vacated(self, agent: mesa.Agent, pos: Position) -> None:
+        """
+        Stops the removed agent waiting and wakes agents waiting next to its
+        cell, if the cell has become free for them.
+        """
+        self.stop_waiting(agent, pos)
+        empty = self.is_cell_empty(pos)
+        if not empty and (agent.is_food_source() or not self.is_free_of_non_food(pos)):
+            # the cell is as full for the waiting agents as it was
+            return
+        for cell in self.get_neighborhood(pos, True, include_center=False):
+            self._wake_cell(cell, empty)
+
+    def _wake_cell(self, pos: Position, empty: bool = True) -> None:
+        """
+        Wakes agents waiting in the cell, only those waiting for a cell free
+        of agents that aren't food unless a cell next to them has become empty.
+        """
+        agents = self._dormant.get(pos)
+        if not agents:
+            return
+        if empty:
+            waking = self._dormant.pop(pos)
+        else:
+            waking = [agent for agent in agents if agent.WAITS_FOR_NON_FOOD]
+            if not waking:
+                return
+            if len(waking) == len(agents):
+                del self._dormant[pos]
+            else:
+                self._dormant[pos] = [
+                    agent for agent in agents if not agent.WAITS_FOR_NON_FOOD
+                ]
+        for agent in waking:
+            agent.wake()
+
+    def _update_counts(self, agent: mesa.Agent, pos: Position, change: int) -> None:
+        agent_type = type(agent)
+        if agent_type not in self.occupancy:
+            self.occupancy[agent_type] = np.zeros(
+                (self.width, self.height), dtype=np.int32
+            )
+        occupancy = self.occupancy[agent_type]
+        occupancy[pos] += change
+        self.agents_count[pos] += change
+        if not agent.is_food_source():
+            self.non_food_count[pos] += change
+        index = self.spatial_hashes.get(agent_type)
+        if index is not None:
+            if occupancy[pos] > 0:
+                index.add(pos)
+            else:
+                index.discard(pos)
+
+    def _update_counts_many(
+        self, agents: Sequence[mesa.Agent], positions: Sequence[Position], change: int
+    ) -> None:
+        """
+        Updates counts of cells of many agents, with one array operation per type.
+        """
+        xs, ys = np.array(positions, dtype=np.intp).reshape(-1, 2).T
+        np.add.at(self.agents_count, (xs, ys), change)
+
+        types = [type(agent) for agent in agents]
+        for agent_type in dict.fromkeys(types):
+            if agent_type not in self.occupancy:
+                self.occupancy[agent_type] = np.zeros(
+                    (self.width, self.height), dtype=np.int32
+                )
+            of_type = np.fromiter(
+                (other is agent_type for other in types), dtype=bool, count=len(types)
+            )
+            np.add.at(self.occupancy[agent_type], (xs[of_type], ys[of_type]), change)
+            if not agents[types.index(agent_type)].is_food_source():
+                np.add.at(self.non_food_count, (xs[of_type], ys[of_type]), change)
+            index = self.spatial_hashes.get(agent_type)
+            if index is not None:
+                occupancy = self.occupancy[agent_type]
+                for pos in zip(xs[of_type].tolist(), ys[of_type].tolist()):
+                    if occupancy[pos] > 0:
+                        index.add(pos)
+                    else:
+                        index.discard(pos)
+
+    def count_type(self, type_class: Type[mesa.Agent], pos: Position) -> int:
+        """
+        Returns the number of agents of the type in the cell.
+        """
+        occupancy = self.occupancy.get(type_class)
+        return 0 if occupancy is None else int(occupancy[pos])
+
+    def is_free_of_non_food(self, pos: Position) -> bool:
+        """
+        Returns True if the cell is empty or contains only food sources.
+        """
+        return self.non_food_count[pos] == 0
+
+    def count_occupied_cells(
+        self,
+        pos: Position,
+        moore: bool = True,
+        include_center: bool = False,
+        radius: int = 1,
+        non_food_only: bool = False,
+    ) -> int:
+        """
+        Returns the number of cells in the neighborhood that contain any agent,
+        or any agent which is not a food source if `non_food_only` is set.
+        """
+        counts = self.non_food_count if non_food_only else self.agents_count
+
+        if self.torus or not moore:
+            return sum(
+                1
+                for cell in self.get_neighborhood(pos, moore, include_center, radius)
+                if counts[cell] > 0
+            )
+
+        x, y = pos
+        window = counts[
+            max(x - radius, 0) : x + radius + 1, max(y - radius, 0) : y + radius + 1
+        ]
+        occupied = int(np.count_nonzero(window))
+        if not include_center and counts[pos] > 0:
+            occupied -= 1
+        return occupied
+
+    def cells_containing(
+        self,
+        pos: Position,
+        radius: int,
+        type_class: Type[mesa.Agent],
+        moore: bool = True,
+        include_center: bool = False,
+    ) -> list[Position]:
+        """
+        Returns cells of the neighborhood that contain an agent of the type,
+        in the same order as `get_neighborhood` returns them.
+        """
+        index = self.spatial_hashes.get(type_class)
+        if index is not None and moore and not self.torus:
+            return index.cells_within(pos, radius, include_center)
+
+        counts = [
+            values
+            for agent_type, values in (*self.occupancy.items(), *self.layers.items())
+            if issubclass(agent_type, type_class)
+        ]
+        if not counts:
+            return []
+
+        if self.torus or not moore:
+            return [
+                cell
+                for cell in self.get_neighborhood(pos, moore, include_center, radius)
+                if any(values[cell] > 0 for values in counts)
+            ]
+
+        x, y = pos
+        min_x, min_y = max(x - radius, 0), max(y - radius, 0)
+        window = counts[0][min_x : x + radius + 1, min_y : y + radius + 1] > 0
+        for values in counts[1:]:
+            window |= values[min_x : x + radius + 1, min_y : y + radius + 1] > 0
+        if not include_center:
+            window[x - min_x, y - min_y] = False
+
+        xs, ys = np.nonzero(window)
+        return list(zip((xs + min_x).tolist(), (ys + min_y).tolist()))
+
+    def nearest_cell_containing(
+        self,
+        pos: Position,
+        radius: int,
+        type_class: Type[mesa.Agent],
+        include_center: bool = False,
+    ) -> Optional[Position]:
+        """
+        Returns the closest cell of the Moore neighborhood that contains an
+        agent of the type, the first one of `get_neighborhood` among equally
+        close ones, or None.
+        """
+        x, y = pos
+        return min(
+            self.cells_containing(pos, radius, type_class, True, include_center),
+            key=lambda cell: max(abs(cell[0] - x), abs(cell[1] - y)),
+            default=None,
+        )
+
+    def get_neighbors_of_type(
+        self,
+        pos: Position,
+        radius: int,
+        type_class: Type[mesa.Agent],
+        predicate: Optional[Callable[[mesa.Agent], bool]] = None,
+        moore: bool = True,
+        include_center: bool = False,
+    ) -> list[mesa.Agent]:
+        """
+        Returns neighbors of the type that satisfy the predicate,
+        in the same order as `get_neighbors` returns them.
+        """
+        return [
+            agent
+            for x, y in self.cells_containing(
+                pos, radius, type_class, moore, include_center
+            )
+            for agent in self._grid[x][y]
+            if isinstance(agent, type_class) and (predicate is None or predicate(agent))
+        ]
+
+
+class SparseMarineGrid(MarineGrid):
+    """
+    A MarineGrid that keeps only the cells with agents, for large, mostly
+    empty grids.
+
+    Agents are kept in a dict of lists of the occupied cells instead of a list
+    of every cell, and counts of agents of every type, and of those which
+    aren't food, in dicts of the occupied cells instead of arrays. The only
+    array is a packed bitmap of cells with any agents, one bit per cell,
+    which window queries search for candidate cells that are then looked up
+    in the dicts. `occupancy`, `agents_count` and `non_food_count` of
+    MarineGrid are read-only arrays built from the dicts when asked for.
+
+    Example:
+    >>> grid = SparseMarineGrid(2000, 2000, torus=False)
+    >>> grid.place_agent(fish, (10, 20))
+    >>> grid.get_neighbors_of_type((10, 21), 1, Fish)
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        torus: bool,
+        neighborhood_cache_size: int = NEIGHBORHOOD_CACHE_SIZE,
+    ) -> None:
+        # what mesa.space.MultiGrid sets up, without a list for every cell
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.num_cells = width * height
+        self._empties_built = False
+        self._neighborhood_cache = {}
+        self.cutoff_empties = 7.953 * self.num_cells**0.384
+
+        self._cells: dict[Position, list[mesa.Agent]] = {}
+        self._type_counts: dict[Type[mesa.Agent], dict[Position, int]] = {}
+        self._non_food_counts: dict[Position, int] = {}
+        # bit y % 8 of byte [x, y // 8] is set when the cell has any agents
+        self._occupied = np.zeros((width, (height + 7) // 8), dtype=np.uint8)
+        self._init_indexes(neighborhood_cache_size)
+
+    def __getitem__(self, index):
+        if isinstance(index[0], tuple):
+            return [self._cells.get(self.torus_adj(pos), []) for pos in index]
+        if isinstance(index, tuple) and all(isinstance(value, int) for value in index):
+            return self._cells.get(self.torus_adj(index), [])
+        raise TypeError("A SparseMarineGrid is indexed by cells only")
+
+    def __iter__(self) -> Iterator[list[mesa.Agent]]:
+        return (content for content, _ in self.coord_iter())
+
+    def coord_iter(self) -> Iterator[tuple[list[mesa.Agent], Position]]:
+        for pos in itertools.product(range(self.width), range(self.height)):
+            yield self._cells.get(pos, []), pos
+
+    @property
+    def occupancy(self) -> dict[Type[mesa.Agent], np.ndarray]:
+        return {
+            agent_type: self._counts_array(counts)
+            for agent_type, counts in self._type_counts.items()
+        }
+
+    @property
+    def agents_count(self) -> np.ndarray:
+        return self._counts_array({pos: len(cell) for pos, cell in self._cells.items()})
+
+    @property
+    def non_food_count(self) -> np.ndarray:
+        return self._counts_array(self._non_food_counts)
+
+    def _counts_array(self, counts: dict[Position, int]) -> np.ndarray:
+        """
+        Returns a read-only [x, y] array of the counts of the cells, changes
+        to the grid aren't written to it.
+        """
+        array = np.zeros((self.width, self.height), dtype=np.int32)
+        if counts:
+            array[tuple(np.array(list(counts), dtype=np.intp).T)] = list(counts.values())
+        array.flags.writeable = False
+        return array
+
+    def is_cell_empty(self, pos: Position) -> bool:
+        return pos not in self._cells
+
+    @mesa.space.accept_tuple_argument
+    def iter_cell_list_contents(
+        self, cell_list: Iterable[Position]
+    ) -> Iterator[mesa.Agent]:
+        cells = self._cells
+        return itertools.chain.from_iterable(
+            cells[pos] for pos in cell_list if pos in cells
+        )
+
+    def place_agent(self, agent: mesa.Agent, pos: Position) -> None:
+        cell = self._cells.get(pos)
+        if cell is None:
+            self._cells[pos] = [agent]
+        elif agent.pos is None or agent not in cell:
+            cell.append(agent)
+        else:
+            return
+        agent.pos = pos
+        if self._empties_built:
+            self._empties.discard(pos)
+        self._update_counts(agent, pos, 1)
+
+    def remove_agent(self, agent: mesa.Agent) -> None:
+        pos = agent.pos
+        cell = self._cells[pos]
+        cell.remove(agent)
+        if not cell:
+            del self._cells[pos]
+            if self._empties_built:
+                self._empties.add(pos)
+        agent.pos = None
+        self._update_counts(agent, pos, -1)
+        if self._dormant:
+            self._vacated(agent, pos)
+
+    def place_agents(
+        self, agents: Sequence[mesa.Agent], positions: Sequence[Position]
+    ) -> None:
+        for agent, pos in zip(agents, positions):
+            self.place_agent(agent, pos)
+
+    def remove_agents(self, agents: Sequence[mesa.Agent]) -> None:
+        for agent in agents:
+            self.remove_agent(agent)
+
+    def _update_counts_many(
+        self, agents: Sequence[mesa.Agent], positions: Sequence[Position], change: int
+    ) -> None:
+        for agent, pos in zip(agents, positions):
+            self._update_counts(agent, pos, change)
+
+    def _update_counts(self, agent: mesa.Agent, pos: Position, change: int) -> None:
+        agent_type = type(agent)
+        counts = self._type_counts.get(agent_type)
+        if counts is None:
+            counts = self._type_counts[agent_type] = {}
+        occupied = _add_count(counts, pos, change)
+        x, y = pos
+        if pos in self._cells:
+            self._occupied[x, y >> 3] |= 1 << (y & 7)
+        else:
+            self._occupied[x, y >> 3] &= 0xFF ^ (1 << (y & 7))
+        if not agent.is_food_source():
+            _add_count(self._non_food_counts, pos, change)
+        index = self.spatial_hashes.get(agent_type)
+        if index is not None:
+            if occupied:
+                index.add(pos)
+            else:
+                index.discard(pos)
+
+    def _occupied_window(self, pos: Position, radius: int) -> tuple[np.ndarray, int, int]:
+        """
+        Returns the bitmap unpacked in the Moore neighborhood of radius around
+        the cell, clipped at the borders, and the cell of its [0, 0].
+        """
+        x, y = pos
+        min_x, min_y = max(x - radius, 0), max(y - radius, 0)
+        max_y = min(y + radius + 1, self.height)
+        bits = np.unpackbits(
+            self._occupied[min_x : x + radius + 1, min_y >> 3 : (max_y + 7) >> 3],
+            axis=1,
+            bitorder="little",
+        )
+        offset = min_y & 7
+        return bits[:, offset : offset + max_y - min_y].view(bool), min_x, min_y
+
+    def occupied_mask(self) -> np.ndarray:
+        return np.unpackbits(
+            self._occupied, axis=1, count=self.height, bitorder="little"
+        ).view(bool)
+
+    def type_mask(self, type_class: Type[mesa.Agent]) -> np.ndarray:
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        counts = self._type_counts.get(type_class)
+        if counts:
+            mask[tuple(np.array(list(counts), dtype=np.intp).T)] = True
+        return mask
+
+    def count_type(self, type_class: Type[mesa.Agent], pos: Position) -> int:
+        return self._type_counts.get(type_class, {}).get(pos, 0)
+
+    def is_free_of_non_food(self, pos: Position) -> bool:
+        return pos not in self._non_food_counts
+
+    def count_occupied_cells(
+        self,
+        pos: Position,
+        moore: bool = True,
+        include_center: bool = False,
+        radius: int = 1,
+        non_food_only: bool = False,
+    ) -> int:
+        cells = self._non_food_counts if non_food_only else self._cells
+
+        if self.torus or not moore:
+            return sum(
+                1
+                for cell in self.get_neighborhood(pos, moore, include_center, radius)
+                if cell in cells
+            )
+
+        window, min_x, min_y = self._occupied_window(pos, radius)
+        if non_food_only:
+            xs, ys = np.nonzero(window)
+            occupied = sum(
+                1 for cell in zip((xs + min_x).tolist(), (ys + min_y).tolist()) if cell in cells
+            )
+        else:
+            occupied = int(np.count_nonzero(window))
+        if not include_center and pos in cells:
+            occupied -= 1
+        return occupied
+
+    def cells_containing(
+        self,
+        pos: Position,
+        radius: int,
+        type_class: Type[mesa.Agent],
+        moore: bool = True,
+        include_center: bool = False,
+    ) -> list[Position]:
+        index = self.spatial_hashes.get(type_class)
+        if index is not None and moore and not self.torus:
+            return index.cells_within(pos, radius, include_center)
+
+        counts = [
+            cells
+            for agent_type, cells in self._type_counts.items()
+            if cells and issubclass(agent_type, type_class)
+        ]
+        layers = [
+            values
+            for agent_type, values in self.layers.items()
+            if issubclass(agent_type, type_class)
+        ]
+        if not counts and not layers:
+            return []
+
+        def contains(cell: Position) -> bool:
+            return any(cell in cells for cells in counts) or any(
+                values[cell] > 0 for values in layers
+            )
+
+        if self.torus or not moore:
+            return [
+                cell
+                for cell in self.get_neighborhood(pos, moore, include_center, radius)
+                if contains(cell)
+            ]
+
+        x, y = pos
+        window, min_x, min_y = self._occupied_window(pos, radius)
+        # cells of layers aren't agents, so they aren't in the bitmap
+        for values in layers:
+            window = window | (values[min_x : x + radius + 1, min_y : y + radius + 1] > 0)
+        xs, ys = np.nonzero(window)
+        return [
+            cell
+            for cell in zip((xs + min_x).tolist(), (ys + min_y).tolist())
+            if (include_center or cell != pos) and contains(cell)
+        ]
+
+    def get_neighbors_of_type(
+        self,
+        pos: Position,
+        radius: int,
+        type_class: Type[mesa.Agent],
+        predicate: Optional[Callable[[mesa.Agent], bool]] = None,
+        moore: bool = True,
+        include_center: bool = False,
+    ) -> list[mesa.Agent]:
+        cells = self._cells
+        return [
+            agent
+            for cell in self.cells_containing(pos, radius, type_class, moore, include_center)
+            for agent in cells.get(cell, ())
+            if isinstance(agent, type_class) and (predicate is None or predicate(agent))
+        ]
+
+
+def _add_count(counts: dict[Position, int], pos: Position, change: int) -> bool:
+    """
+    Changes the count of the cell, keeping only positive counts, and returns
+    whether the cell still has any.
+    """
+    count = counts.get(pos, 0) + change
+    if count > 0:
+        counts[pos] = count
+        return True
+    counts.pop(pos, None)
+    return False
@@ -0,0 +1,136 @@
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+# reasons why a run stopped before its last step
+EXTINCTION = "extinction"
+PLANKTON_COVER = "plankton_cover"
+STEADY_STATE = "steady_state"
+
+
+class StoppingCriteria:
+    """
+    Conditions on population counts that end a run early.
+
+    A run stops:
+    - on extinction - when all the columns of one of the `extinct` groups
+      (a column or a list of columns) are 0, e.g. of all stages of jellyfish,
+    - on plankton cover - when plankton covers at least `max_plankton_cover`
+      of the cells of the grid,
+    - on a steady state - when mean and standard deviation of every one of
+      `steady_columns` over the last `period` steps (a year of temperatures)
+      differ from those over the period before by at most `tolerance` of
+      the larger of them. It's checked at the end of every period, the
+      periods are aligned to the temperature cycle, so the seasons don't
+      count as changes.
+
+    Only the counts of the last two periods of `steady_columns` are kept.
+
+    Example:
+    >>> criteria = StoppingCriteria(extinct=[["Jellyfish Medusae", "Jellyfish Polyps"]])
+    >>> criteria.check(model.current_step, {"Jellyfish Medusae": 0, "Jellyfish Polyps": 0})
+    'extinction'
+    """
+
+    def __init__(
+        self,
+        extinct: Sequence[Union[str, Sequence[str]]] = (),
+        max_plankton_cover: Optional[float] = None,
+        cells: Optional[int] = None,
+        steady_columns: Sequence[str] = (),
+        period: int = 365,
+        tolerance: float = 0.05,
+    ) -> None:
+        if max_plankton_cover is not None and cells is None:
+            raise ValueError("Plankton cover requires the number of cells")
+        if period <= 0:
+            raise ValueError(f"The period must be positive, not {period}")
+
+        self.extinct = [
+            (group,) if isinstance(group, str) else tuple(group) for group in extinct
+        ]
+        self.max_plankton_cover = max_plankton_cover
+        self.cells = cells
+        self.steady_columns = list(steady_columns)
+        self.period = period
+        self.tolerance = tolerance
+
+        # counts of the last two periods, step s in row (s - 1) % (2 * period)
+        self._history = np.zeros((2 * period, len(self.steady_columns)))
+
+        columns = {column for group in self.extinct for column in group}
+        if max_plankton_cover is not None:
+            columns.add("Plankton")
+        columns.update(self.steady_columns)
+        self.columns = sorted(columns)
+
+    @classmethod
+    def from_config(cls, config, cells: int, **kwargs) -> "StoppingCriteria":
+        """
+        Returns the criteria of a ModelConfig, with model keyword arguments
+        of the same names replacing its `stop_...` fields.
+        """
+        return cls(
+            extinct=kwargs.get("stop_extinct", config.stop_extinct),
+            max_plankton_cover=kwargs.get(
+                "stop_max_plankton_cover", config.stop_max_plankton_cover
+            ),
+            cells=cells,
+            steady_columns=kwargs.get("stop_steady_columns", config.stop_steady_columns),
+            period=kwargs.get("stop_period", config.stop_period),
+            tolerance=kwargs.get("stop_tolerance", config.stop_tolerance),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.columns)
+
+    def validate(self, columns: Iterable[str]) -> None:
+        """
+        Checks that the criteria use only the given columns of population counts.
+        """
+        unknown = set(self.columns) - set(columns)
+        if unknown:
+            raise ValueError(f"Stopping criteria use unknown columns {sorted(unknown)}")
+
+    def check(self, step: int, counts: dict[str, float]) -> Optional[str]:
+        """
+        Takes the counts of the step and returns why the run should stop,
+        or None if it should go on.
+        """
+        for group in self.extinct:
+            if all(counts[column] == 0 for column in group):
+                return EXTINCTION
+
+        if (
+            self.max_plankton_cover is not None
+            and counts["Plankton"] >= self.max_plankton_cover * self.cells
+        ):
+            return PLANKTON_COVER
+
+        if self.steady_columns:
+            self._history[(step - 1) % len(self._history)] = [
+                counts[column] for column in self.steady_columns
+            ]
+            if step >= len(self._history) and step % self.period == 0:
+                if self._is_steady(step):
+                    return STEADY_STATE
+
+        return None
+
+    def _is_steady(self, step: int) -> bool:
+        rows = np.arange(step - len(self._history), step) % len(self._history)
+        window = self._history[rows]
+        previous, last = window[: self.period], window[self.period :]
+        for statistic in (np.mean, np.std):
+            before, after = statistic(previous, axis=0), statistic(last, axis=0)
+            scale = np.maximum(np.maximum(before, after), 1)
+            if np.any(np.abs(after - before) > self.tolerance * scale):
+                return False
+        return True
+
+    def get_state(self) -> np.ndarray:
+        return self._history
+
+    def set_state(self, history: np.ndarray) -> None:
+        self._history[:] = history
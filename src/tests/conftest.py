@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules of the model are imported from the `src` directory, like its scripts do
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(autouse=True)
+def in_src_dir(monkeypatch):
+    """
+    Runs every test in the `src` directory, where paths of configs are relative to.
+    """
+    monkeypatch.chdir(SRC_DIR)
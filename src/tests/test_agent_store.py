@@ -0,0 +1,33 @@
+import pytest
+
+from agents.animals import Fish
+from batch import default_parameters
+from model import MarineEcosystem
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_animals_are_handles_to_rows(vectorized):
+    model = MarineEcosystem(**default_parameters(), seed=0, agent_store=vectorized)
+    [fish] = model.spawn_many(Fish, [(0, 0)])
+
+    slots = [slot for cls in Fish.__mro__ for slot in getattr(cls, "__slots__", ())]
+    assert not hasattr(fish, "__dict__")
+    assert not [slot for slot in slots if slot.startswith("_")]
+    fish.energy = 7
+    assert fish.store.columns["energy"][fish.row] == 7
+    assert fish.store.VECTORIZED == vectorized
+
+
+def test_store_finds_starving_agents_by_id():
+    model = MarineEcosystem(**default_parameters(), seed=0, agent_store=True)
+    [fish] = model.spawn_many(Fish, [(0, 0)])
+    store, row = fish.store, fish.row
+    fish.energy = 0.5
+
+    model.agent_store.step()
+
+    assert fish.unique_id not in model.schedule._agents
+    assert not store.alive[row]
+    newborn = Fish(model.next_id(), (0, 0), model)
+    assert newborn.row == row
+    assert store.unique_ids[row] == newborn.unique_id
@@ -0,0 +1,35 @@
+import dataclasses
+
+from batch import CONFIG_FILE_PATH, default_parameters
+from config import load_config
+from model import MarineEcosystem
+
+
+def test_replaced_config_round_trip(tmp_path):
+    parameters = default_parameters()
+    parameters.pop("config_filepath")
+    config = dataclasses.replace(
+        load_config(CONFIG_FILE_PATH),
+        width=40,
+        height=30,
+        jellyfish_medusa_reproduce_probability=0.9,
+        stop_extinct=(("Jellyfish Medusae", "Jellyfish Polyps"),),
+        path=None,
+    )
+    model = MarineEcosystem(config, seed=1, **parameters)
+    for _ in range(10):
+        model.step()
+    path = str(tmp_path / "checkpoint.npz")
+    model.save_checkpoint(path)
+
+    restored = MarineEcosystem.from_checkpoint(path)
+
+    assert restored.config == config
+    assert (restored.width, restored.height) == (40, 30)
+    assert restored.jellyfish_medusa_reproduce_probability == 0.9
+    for _ in range(10):
+        model.step()
+        restored.step()
+    expected = model.datacollector.get_model_vars_dataframe().iloc[-10:]
+    actual = restored.datacollector.get_model_vars_dataframe().iloc[-10:]
+    assert actual.values.tolist() == expected.values.tolist()
@@ -0,0 +1,56 @@
+from agents.food_source import Plankton
+from batch import default_parameters
+from model import MarineEcosystem
+
+STEPS = 60
+
+
+def run(dormancy: bool) -> tuple[MarineEcosystem, int]:
+    """
+    Runs the default model into a plankton bloom and counts the agents stepped.
+    """
+    model = MarineEcosystem(**default_parameters(), seed=0, dormancy=dormancy)
+    agent_steps = 0
+    for _ in range(STEPS):
+        agent_steps += sum(len(agents) for agents in model.schedule.awake_by_type.values())
+        model.step()
+    return model, agent_steps
+
+
+def test_fewer_agent_steps_under_bloom():
+    _, without = run(dormancy=False)
+    model, with_dormancy = run(dormancy=True)
+
+    dormant = model.grid.get_dormant()
+    assert len(dormant) > model.schedule.get_type_count(Plankton) / 2
+    assert with_dormancy < without / 2
+
+
+def test_dormant_agents_wait_once():
+    model, _ = run(dormancy=True)
+
+    dormant = model.grid.get_dormant()
+    assert len({agent.unique_id for agent in dormant}) == len(dormant)
+    assert all(agent.asleep for agent in dormant)
+
+
+def test_occupied_cell_wakes_no_one():
+    model, _ = run(dormancy=True)
+    grid = model.grid
+    # a plankton waiting for an empty cell next to a cell with only plankton in it
+    sleeper, cell = next(
+        (agent, cell)
+        for agent in grid.get_dormant()
+        if isinstance(agent, Plankton)
+        for cell in grid.get_neighborhood(agent.pos, True, include_center=False)
+        if grid.get_cell_list_contents([cell])
+        and all(isinstance(other, Plankton) for other in grid.get_cell_list_contents([cell]))
+    )
+    animal = next(agent for agent in model.schedule.agents if not agent.is_food_source())
+
+    # the animal passes through the cell, which stays occupied by the plankton
+    grid.move_agent(animal, cell)
+    grid.move_agent(animal, (0, 0))
+
+    assert sleeper in grid.get_dormant()
+    assert sleeper.asleep
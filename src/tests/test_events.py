@@ -0,0 +1,26 @@
+import pytest
+
+from batch import default_parameters
+from events import SPECIES, EventType
+from model import MarineEcosystem
+
+
+def population(model: MarineEcosystem) -> dict[str, int]:
+    counts = dict.fromkeys(SPECIES, 0)
+    for agent in model.schedule.agents:
+        counts[type(agent).__name__] += 1
+    return counts
+
+
+@pytest.mark.parametrize("options", [{}, {"agent_store": True, "growth_timers": True}])
+def test_births_minus_deaths_is_population_change(options):
+    model = MarineEcosystem(**default_parameters(), seed=3, **options)
+    start = population(model)
+    for _ in range(60):
+        model.step()
+    end = population(model)
+
+    for species in SPECIES:
+        births = model.events.count(EventType.BIRTH, species)
+        deaths = model.events.count(EventType.DEATH, species)
+        assert births - deaths == end[species] - start[species], species
@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+
+from space import MarineGrid, SparseMarineGrid
+
+WIDTH, HEIGHT = 30, 20
+
+
+class Agent:
+    def __init__(self, unique_id: int) -> None:
+        self.unique_id = unique_id
+        self.pos = None
+
+    def is_food_source(self) -> bool:
+        return False
+
+
+class Prey(Agent):
+    pass
+
+
+class Food(Agent):
+    def is_food_source(self) -> bool:
+        return True
+
+
+def populate(grid_class, seed: int = 0):
+    """
+    Places, moves and removes the same agents at random on a new grid of the class.
+    """
+    rng = random.Random(seed)
+    grid = grid_class(WIDTH, HEIGHT, torus=False)
+    agents = [rng.choice((Agent, Prey, Food))(unique_id) for unique_id in range(300)]
+    positions = [(rng.randrange(WIDTH), rng.randrange(HEIGHT)) for _ in agents]
+    grid.place_agents(agents[:150], positions[:150])
+    for agent, pos in zip(agents[150:], positions[150:]):
+        grid.place_agent(agent, pos)
+    for agent in agents[:40]:
+        grid.move_agent(agent, (rng.randrange(WIDTH), rng.randrange(HEIGHT)))
+    grid.remove_agents(agents[40:70])
+    for agent in agents[70:90]:
+        grid.remove_agent(agent)
+    return grid
+
+
+def test_sparse_grid_answers_the_inherited_queries():
+    dense = populate(MarineGrid)
+    sparse = populate(SparseMarineGrid)
+
+    assert np.array_equal(sparse.agents_count, dense.agents_count)
+    assert np.array_equal(sparse.non_food_count, dense.non_food_count)
+    assert sparse.occupancy.keys() == dense.occupancy.keys()
+    for agent_type, occupancy in dense.occupancy.items():
+        assert np.array_equal(sparse.occupancy[agent_type], occupancy)
+        assert np.array_equal(sparse.type_mask(agent_type), dense.type_mask(agent_type))
+    assert np.array_equal(sparse.occupied_mask(), dense.occupied_mask())
+    assert sparse.empties == dense.empties
+
+    ids = lambda agents: sorted(agent.unique_id for agent in agents)  # noqa: E731
+    for pos in [(0, 0), (WIDTH - 1, HEIGHT - 1), (5, 7), (15, 10), (29, 3)]:
+        assert ids(sparse.get_cell_list_contents([pos])) == ids(dense.get_cell_list_contents([pos]))
+        assert sparse.is_cell_empty(pos) == dense.is_cell_empty(pos)
+        assert sparse.is_free_of_non_food(pos) == dense.is_free_of_non_food(pos)
+        for agent_type in (Agent, Prey, Food):
+            assert sparse.count_type(agent_type, pos) == dense.count_type(agent_type, pos)
+        for radius in (1, 3):
+            for non_food_only in (False, True):
+                assert sparse.count_occupied_cells(
+                    pos, radius=radius, non_food_only=non_food_only
+                ) == dense.count_occupied_cells(pos, radius=radius, non_food_only=non_food_only)
+            assert ids(sparse.get_neighbors(pos, True, radius=radius)) == ids(
+                dense.get_neighbors(pos, True, radius=radius)
+            )
+            for agent_type in (Agent, Prey, Food):
+                assert sorted(sparse.cells_containing(pos, radius, agent_type)) == sorted(
+                    dense.cells_containing(pos, radius, agent_type)
+                )
+                assert ids(sparse.get_neighbors_of_type(pos, radius, agent_type)) == ids(
+                    dense.get_neighbors_of_type(pos, radius, agent_type)
+                )
+                assert sparse.nearest_cell_containing(
+                    pos, radius, agent_type
+                ) == dense.nearest_cell_containing(pos, radius, agent_type)
+
+
+def test_sparse_grid_counts_are_read_only():
+    grid = populate(SparseMarineGrid)
+
+    counts = grid.agents_count
+    assert not counts.flags.writeable
+    with pytest.raises(ValueError):
+        counts[0, 0] = 1
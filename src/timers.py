@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Optional
+
+import mesa
+import numpy as np
+
+from agents.base import Countdown
+
+
+class TimerWheel:
+    """
+    Calls of agents' methods at the start of given steps, driven by their
+    `Countdown`s, so agents that only count down don't have to be stepped.
+
+    Timers are kept in one bucket per step, so starting a timer and firing
+    the due ones cost O(1) per timer. A timer is skipped when its bucket comes
+    if its agent was removed or its countdown was set again in the meantime.
+
+    Example:
+    >>> model.timers.start(model.current_step + 10, polyp, JellyfishPolyp.time_to_grow)
+    >>> model.timers.fire(model.current_step)
+    """
+
+    def __init__(self) -> None:
+        self._buckets: defaultdict[int, list[tuple[mesa.Agent, Countdown]]] = defaultdict(
+            list
+        )
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def start(self, step: int, agent: mesa.Agent, countdown: Countdown) -> None:
+        self._buckets[step].append((agent, countdown))
+
+    def fire(self, step: int) -> None:
+        """
+        Calls back the agents whose timers are due at the step, in the order
+        the timers were started.
+        """
+        for agent, countdown in self._buckets.pop(step, ()):
+            if agent.pos is not None and countdown.is_due(agent, step):
+                getattr(agent, countdown.callback)()
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """
+        Returns the pending timers as arrays of steps, agents' ids and names
+        of countdowns, e.g. for a checkpoint.
+        """
+        timers = [
+            (step, agent.unique_id, countdown.name)
+            for step, bucket in sorted(self._buckets.items())
+            for agent, countdown in bucket
+            if agent.pos is not None and countdown.is_due(agent, step)
+        ]
+        return {
+            "step": np.array([step for step, _, _ in timers], dtype=np.int64),
+            "agent": np.array([unique_id for _, unique_id, _ in timers], dtype=np.int64),
+            "countdown": np.array([name for _, _, name in timers], dtype=str),
+        }
+
+    def set_state(
+        self, state: dict[str, np.ndarray], agents: dict[int, mesa.Agent]
+    ) -> None:
+        """
+        Replaces the pending timers with the saved ones of the given agents.
+        """
+        self._buckets.clear()
+        for step, unique_id, name in zip(
+            state["step"].tolist(), state["agent"].tolist(), state["countdown"].tolist()
+        ):
+            agent: Optional[mesa.Agent] = agents.get(unique_id)
+            if agent is None:
+                continue
+            countdown = getattr(type(agent), name)
+            countdown.set_timer(agent, step)
+            self.start(step, agent, countdown)